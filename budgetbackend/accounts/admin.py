@@ -1,3 +1,16 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-# Register your models here.
+from budgetbackend.admin import ScalableModelAdmin
+
+from .models import User
+
+
+@admin.register(User)
+class UserAdmin(ScalableModelAdmin, BaseUserAdmin):
+    list_display = ("id", "username", "email", "base_currency", "is_staff", "date_joined")
+    list_filter = ("is_staff", "is_superuser", "is_active")
+    search_fields = ("username__exact", "email__exact")
+    search_help_text = "Exact username or email"
+    ordering = ("-pk",)
+    fieldsets = BaseUserAdmin.fieldsets + (("Budget", {"fields": ("initial_balance", "base_currency")}),)
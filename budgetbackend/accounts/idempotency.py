@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from drf_yasg import openapi
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+idempotency_key_parameter = openapi.Parameter(
+    HEADER,
+    openapi.IN_HEADER,
+    description="Unique key for this write; retries with the same key return the original response",
+    type=openapi.TYPE_STRING,
+)
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used with a different request."
+    default_code = "idempotency_key_reused"
+
+
+class Replay(Exception):
+    def __init__(self, record):
+        self.record = record
+
+
+class IdempotentCreateMixin:
+    """Make POST safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key inserts a placeholder row; the unique constraint on
+    (user, key, scope) makes that insert the lock, so a concurrent duplicate gets 409
+    instead of running the view a second time. When the view finishes, its response is
+    stored on the row and retries within ``IDEMPOTENCY_KEY_TTL`` get it back without
+    validating or saving anything. Server errors are not stored, so those can be retried.
+
+    Top-level response fields named in ``idempotency_secret_fields`` are left out of the
+    stored body; replays of successful responses get them from ``restore_idempotency_secrets``.
+    """
+
+    idempotency_secret_fields = ()
+
+    def restore_idempotency_secrets(self, data):
+        """Return the secret fields for a replay of the stored response ``data``."""
+        return {}
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication, permissions and throttling run first, as for any other request.
+        super().initial(request, *args, **kwargs)
+        self.idempotency_record = None
+        key = request.headers.get(HEADER)
+        if request.method != "POST" or key is None:
+            return
+        if not key or len(key) > 255:
+            raise ValidationError({HEADER: "Must be between 1 and 255 characters."})
+        self.idempotency_record = self.claim_idempotency_key(request, key)
+
+    def claim_idempotency_key(self, request, key):
+        user = request.user if request.user.is_authenticated else None
+        scope = request.path
+        # Keyed, so the stored hash of a login or registration body cannot be brute-forced for the password.
+        request_hash = hmac.new(settings.SECRET_KEY.encode(), request.body, hashlib.sha256).hexdigest()
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, key=key, scope=scope, request_hash=request_hash, expires_at=expires_at
+                )
+        except IntegrityError:
+            pass
+
+        with transaction.atomic():
+            record = IdempotencyKey.objects.select_for_update().get(user=user, key=key, scope=scope)
+            abandoned = record.status_code is None and record.created_at < now - timedelta(
+                seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+            )
+            if record.expires_at <= now or abandoned:
+                # Start over as if the key were new.
+                record.request_hash = request_hash
+                record.status_code = None
+                record.response_body = ""
+                record.content_type = ""
+                record.location = ""
+                record.created_at = now
+                record.expires_at = expires_at
+                record.save()
+                return record
+        if record.request_hash != request_hash:
+            raise IdempotencyKeyReused()
+        if record.status_code is None:
+            raise IdempotencyConflict()
+        raise Replay(record)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Exception:
+            # Unhandled errors skip finalize_response; free the key so the client can retry.
+            if getattr(self, "idempotency_record", None) is not None:
+                self.idempotency_record.delete()
+            raise
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            record = exc.record
+            body = record.response_body
+            if self.idempotency_secret_fields and status.is_success(record.status_code):
+                data = json.loads(body)
+                data.update(self.restore_idempotency_secrets(data))
+                body = JSONRenderer().render(data)
+            response = HttpResponse(body, status=record.status_code, content_type=record.content_type)
+            response["Idempotent-Replayed"] = "true"
+            if record.location:
+                response["Location"] = record.location
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = getattr(self, "idempotency_record", None)
+        if record is not None:
+            if response.status_code >= 500:
+                record.delete()
+            else:
+                # Store the rendered body so a replay is byte-for-byte the original.
+                response.render()
+                record.status_code = response.status_code
+                record.response_body = response.content.decode(response.charset)
+                if self.idempotency_secret_fields and isinstance(getattr(response, "data", None), dict):
+                    data = {
+                        name: value
+                        for name, value in response.data.items()
+                        if name not in self.idempotency_secret_fields
+                    }
+                    record.response_body = JSONRenderer().render(data).decode()
+                record.content_type = response.get("Content-Type", "")
+                record.location = response.get("Location", "")
+                record.save(update_fields=["status_code", "response_body", "content_type", "location"])
+            self.idempotency_record = None
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:02
+
+import json
+
+from django.db import migrations
+
+
+def redact_tokens(apps, schema_editor):
+    IdempotencyKey = apps.get_model("accounts", "IdempotencyKey")
+    stored = IdempotencyKey.objects.filter(response_body__contains='"token"').only("response_body")
+    for record in stored.iterator():
+        try:
+            data = json.loads(record.response_body)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.pop("token", None) is not None:
+            record.response_body = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+            record.save(update_fields=["response_body"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_usershard"),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_tokens, migrations.RunPython.noop),
+    ]
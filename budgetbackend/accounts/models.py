@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -7,14 +8,70 @@ class User(AbstractUser):
     initial_balance = models.DecimalField(
         max_digits=10, decimal_places=2, default=1000.00, validators=[MinValueValidator(0)]
     )
+    base_currency = models.CharField(max_length=3, default=settings.DEFAULT_CURRENCY)
 
     @property
     def current_balance(self):
         """Calculate current balance without direct Expense import"""
         if not hasattr(self, "_current_balance"):
-            total_expenses = self.expenses.aggregate(total=models.Sum("amount"))["total"] or 0
+            total_expenses = self.expenses.aggregate(total=models.Sum("base_amount"))["total"] or 0
+            if self.archived_years.exists():
+                from expenses import archive
+
+                total_expenses += archive.total(self.pk)
             self._current_balance = self.initial_balance - total_expenses
         return self._current_balance
 
     def __str__(self):
         return self.username
+
+
+class IdempotencyKey(models.Model):
+    """The stored outcome of a write sent with an ``Idempotency-Key`` header.
+
+    ``status_code`` is empty while the first request is still running.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=2048, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key", "scope"], name="unique_user_idempotency_key"),
+            # NULLs are distinct in unique constraints, so anonymous keys need their own.
+            models.UniqueConstraint(
+                fields=["key", "scope"],
+                condition=models.Q(user__isnull=True),
+                name="unique_anonymous_idempotency_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class UserShard(models.Model):
+    """The database holding a user's categories, expenses and related rows (see budgetbackend/sharding.py).
+
+    ``moving_to`` is set while the user's rows are being copied to another shard, and
+    ``cleanup_shard`` until the copies left on the old shard have been deleted.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="shard")
+    shard = models.CharField(max_length=100)
+    moving_to = models.CharField(max_length=100, blank=True)
+    cleanup_shard = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.shard}"
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 
+from expenses import currency
+
 from .models import User
 
 
@@ -9,15 +12,23 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ("id", "username", "email", "password", "initial_balance")
+        fields = ("id", "username", "email", "password", "initial_balance", "base_currency")
         extra_kwargs = {"password": {"write_only": True}}
 
+    def validate_base_currency(self, value):
+        value = value.upper()
+        # The default needs no rates until expenses arrive in another currency, as when it is left out.
+        if value != settings.DEFAULT_CURRENCY and not currency.is_supported(value):
+            raise serializers.ValidationError(f"No exchange rates are available for {value}.")
+        return value
+
     def create(self, validated_data):
         user = User.objects.create_user(
             username=validated_data["username"],
             email=validated_data.get("email", ""),
             password=validated_data["password"],
             initial_balance=validated_data.get("initial_balance", 1000.00),
+            base_currency=validated_data.get("base_currency", settings.DEFAULT_CURRENCY),
         )
         return user
 
@@ -38,4 +49,4 @@ class UserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ("id", "username", "email", "initial_balance", "current_balance")
+        fields = ("id", "username", "email", "initial_balance", "base_currency", "current_balance")
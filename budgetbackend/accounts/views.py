@@ -5,17 +5,27 @@ from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from .idempotency import IdempotentCreateMixin, idempotency_key_parameter
 from .serializers import UserLoginSerializer, UserRegistrationSerializer, UserSerializer
 
 
-class UserRegistrationView(generics.CreateAPIView):
+class UserRegistrationView(IdempotentCreateMixin, generics.CreateAPIView):
     permission_classes = (AllowAny,)
     serializer_class = UserRegistrationSerializer
+    throttle_rates = {"write": "10/hour"}
+    # Replays read the token back instead of it being stored with the idempotency key.
+    idempotency_secret_fields = ("token",)
+
+    def restore_idempotency_secrets(self, data):
+        return {
+            "token": Token.objects.filter(user_id=data["user"]["id"]).values_list("key", flat=True).first()
+        }
 
     @swagger_auto_schema(
         tags=["Authentication"],
         operation_description="Register a new user account",
         request_body=UserRegistrationSerializer,
+        manual_parameters=[idempotency_key_parameter],
         responses={
             201: openapi.Response(
                 description="User created successfully",
@@ -52,6 +62,7 @@ class UserRegistrationView(generics.CreateAPIView):
 class UserLoginView(generics.GenericAPIView):
     permission_classes = (AllowAny,)
     serializer_class = UserLoginSerializer
+    throttle_rates = {"write": "20/min"}
 
     @swagger_auto_schema(
         tags=["Authentication"],
@@ -0,0 +1,189 @@
+"""Admin building blocks for tables with tens of millions of rows.
+
+The stock changelist counts the whole table (twice with a filter applied) and the stock
+delete action loads, collects and lists every selected object before deleting it. The
+pieces here keep each changelist page to an index scan and run bulk actions in
+primary-key batches. Sharded tables are browsed one shard at a time.
+"""
+
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+
+from accounts.models import User
+
+from . import sharding
+
+
+def estimated_row_count(queryset):
+    """The planner's row estimate for the table, or ``None`` when the database has none."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that were never vacuumed or analyzed.
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Avoid ``COUNT(*)`` over big tables.
+
+    Unfiltered changelists use the planner's estimate. Filtered ones count at most
+    ``ADMIN_COUNT_LIMIT`` rows, so paging stops there; narrow the filter to see more.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_COUNT_LIMIT
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return self.object_list[: limit + 1].count()
+
+
+def batched_pks(queryset, batch_size):
+    """Yield the primary keys of ``queryset`` in ascending batches (keyset pagination)."""
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    last_pk = None
+    while True:
+        batch = list((pks if last_pk is None else pks.filter(pk__gt=last_pk))[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1]
+        yield batch
+
+
+@admin.action(permissions=["delete"], description="Delete selected %(verbose_name_plural)s in batches")
+def delete_in_batches(modeladmin, request, queryset):
+    """Like the stock delete action, but without loading every object for the confirmation page.
+
+    Each batch is deleted in its own transaction through the ORM, so cascades and delete
+    signals (sync tombstones, change history) still run.
+    """
+    opts = modeladmin.model._meta
+    if request.POST.get("post") != "yes":
+        return TemplateResponse(
+            request,
+            "admin/batch_delete_confirmation.html",
+            {
+                **modeladmin.admin_site.each_context(request),
+                "title": f"Delete {opts.verbose_name_plural}?",
+                "opts": opts,
+                "queryset": queryset,
+                "count": queryset[: settings.ADMIN_COUNT_LIMIT + 1].count(),
+                "count_limit": settings.ADMIN_COUNT_LIMIT,
+                "action_checkbox_name": admin.helpers.ACTION_CHECKBOX_NAME,
+                "selected": request.POST.getlist(admin.helpers.ACTION_CHECKBOX_NAME),
+                "select_across": request.POST.get("select_across"),
+                "action": request.POST.get("action"),
+            },
+        )
+
+    deleted = 0
+    for pks in batched_pks(queryset, settings.ADMIN_ACTION_BATCH_SIZE):
+        with transaction.atomic(using=queryset.db), modeladmin.delete_batch_context():
+            deleted += (
+                modeladmin.model.objects.using(queryset.db).filter(pk__in=pks).delete()[1].get(opts.label, 0)
+            )
+    modeladmin.message_user(request, f"Deleted {deleted} {opts.verbose_name_plural}.", messages.SUCCESS)
+    return None
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) behind "N results (M total)".
+    show_full_result_count = False
+    list_per_page = 50
+    actions = [delete_in_batches]
+    # Entered inside the transaction of every batch of delete_in_batches.
+    delete_batch_context = nullcontext
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Pick the shard a changelist shows; there is no "All", each shard is listed on its own."""
+
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def queryset(self, request, queryset):
+        # ShardedModelAdmin routes the whole changelist; nothing to filter here.
+        return queryset
+
+    def choices(self, changelist):
+        current = sharding.current_shard()
+        for alias, title in self.lookup_choices:
+            yield {
+                "selected": alias == current,
+                "query_string": changelist.get_query_string({self.parameter_name: alias}),
+                "display": title,
+            }
+
+
+class ShardedModelAdmin(ScalableModelAdmin):
+    """Admin for the models in ``sharding.SHARDED_MODELS``.
+
+    A changelist, and the actions run from it, works on one shard: the one picked in the
+    shard filter, else the shard of the user whose exact username is searched for, else
+    ``default``. Object pages work on the shard holding the object.
+    """
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if len(sharding.shards()) > 1:
+            return [*list_filter, ShardFilter]
+        return list_filter
+
+    def changelist_shard(self, request):
+        alias = request.GET.get(ShardFilter.parameter_name)
+        if alias in sharding.shards():
+            return alias
+        username = request.GET.get("q", "").strip()
+        user_id = username and User.objects.filter(username=username).values_list("pk", flat=True).first()
+        return sharding.shard_for_user(user_id) if user_id else sharding.DEFAULT_DB_ALIAS
+
+    def object_shard(self, object_id):
+        try:
+            return sharding.shard_for_pk(self.model, int(object_id))
+        except (TypeError, ValueError):
+            return sharding.DEFAULT_DB_ALIAS
+
+    def on_shard(self, alias, view, *args, **kwargs):
+        with sharding.on_shard(alias):
+            response = view(*args, **kwargs)
+            # Querysets are routed when evaluated, which for templates is at render time.
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self.on_shard(self.changelist_shard(request), super().changelist_view, request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        alias = self.object_shard(object_id) if object_id else sharding.DEFAULT_DB_ALIAS
+        return self.on_shard(alias, super().changeform_view, request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self.on_shard(
+            self.object_shard(object_id), super().delete_view, request, object_id, extra_context
+        )
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self.on_shard(
+            self.object_shard(object_id), super().history_view, request, object_id, extra_context
+        )
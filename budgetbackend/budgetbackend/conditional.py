@@ -0,0 +1,59 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalGetMixin:
+    """Answer GET with 304 Not Modified before any serialization when nothing changed.
+
+    Views return the querysets their response depends on from ``get_validator_querysets``.
+    The ETag is a hash of the request path and, for each queryset, ``max(updated_at)`` and
+    its row count, which one indexed aggregate query per queryset yields. Deletions change
+    the count and inserts or updates change ``max(updated_at)``. Responses that also depend
+    on something else, such as the current date, add it through ``get_validator_extras``.
+    """
+
+    def get_validator_querysets(self):
+        raise NotImplementedError
+
+    def get_validator_extras(self):
+        return []
+
+    def get_etag(self, request):
+        parts = [request.get_full_path(), request.user.pk, *self.get_validator_extras()]
+        for queryset in self.get_validator_querysets():
+            validators = queryset.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+            parts += [validators["last_modified"], validators["count"]]
+        return quote_etag(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ("GET", "HEAD"):
+            self.etag = self.get_etag(request)
+            # Compression downgrades our ETag to a weak one; both forms match.
+            client_etags = [
+                etag.removeprefix("W/") for etag in parse_etags(request.headers.get("If-None-Match", ""))
+            ]
+            if self.etag in client_etags or "*" in client_etags:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+        return response
@@ -0,0 +1,102 @@
+"""Swagger/ReDoc pages and the OpenAPI document they load.
+
+drf_yasg's generator and UI renderers are only imported when a docs page is first
+requested, so they stay out of worker boot and management commands.
+
+The OpenAPI document is generated once per code version, normally at build time by
+``manage.py build_api_schema``, and served from memory with a strong ETag. The UI pages
+are only the HTML shell of Swagger UI or ReDoc, rendered without the schema generator;
+the browser then fetches the document from ``openapi-schema`` (see
+``SWAGGER_SETTINGS["SPEC_URL"]``).
+"""
+
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_safe
+
+# Generated documents keyed by settings.CODE_VERSION: {version: (body, etag)}
+_documents = {}
+
+
+def api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Home Budget API",
+        default_version="v1",
+        description="API for Home Budget Application",
+    )
+
+
+def schema_path(version=None):
+    return Path(settings.API_SCHEMA_DIR) / f"openapi-{version or settings.CODE_VERSION}.json"
+
+
+def generate_schema():
+    """Introspect every API view and return the OpenAPI document as JSON bytes."""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def schema_document():
+    """Return ``(body, etag)`` for the current code version.
+
+    Read from the file written at build time when present, otherwise generated once
+    in this process.
+    """
+    version = settings.CODE_VERSION
+    document = _documents.get(version)
+    if document is None:
+        path = schema_path(version)
+        body = path.read_bytes() if path.exists() else generate_schema()
+        document = _documents[version] = (body, hashlib.sha256(body).hexdigest())
+    return document
+
+
+@require_safe
+@condition(etag_func=lambda request: schema_document()[1])
+def openapi_json(request):
+    response = HttpResponse(schema_document()[0], content_type="application/json")
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    return response
+
+
+def ui_page(request, renderer_class):
+    from drf_yasg import openapi
+
+    renderer = renderer_class()
+    context = {"request": request}
+    # Renderers only read the document's title and version; the browser loads the rest.
+    renderer.set_context(context, openapi.Swagger(info=api_info(), _prefix="/", paths=openapi.Paths({})))
+    return HttpResponse(
+        render_to_string(renderer.template, context, request), content_type="text/html; charset=utf-8"
+    )
+
+
+@csrf_exempt
+@require_safe
+def swagger_ui(request, *args, **kwargs):
+    if request.GET.get("format") == "openapi":
+        return openapi_json(request)
+    from drf_yasg.renderers import SwaggerUIRenderer
+
+    return ui_page(request, SwaggerUIRenderer)
+
+
+@csrf_exempt
+@require_safe
+def redoc_ui(request, *args, **kwargs):
+    if request.GET.get("format") == "openapi":
+        return openapi_json(request)
+    from drf_yasg.renderers import ReDocRenderer
+
+    return ui_page(request, ReDocRenderer)
@@ -0,0 +1,18 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from .sharding import UserMoving
+
+
+class ShardUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = UserMoving.message
+    default_code = "user_moving"
+
+
+def exception_handler(exc, context):
+    """DRF's handler, plus 503 responses for writes the shard router refused."""
+    if isinstance(exc, UserMoving):
+        exc = ShardUnavailable(str(exc))
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,146 @@
+"""In-process publish/subscribe with optional PostgreSQL fan-out.
+
+Subscribers are asyncio queues in the event loop of an ASGI worker; publishers are
+ordinary synchronous code such as signal handlers. An idle subscriber costs one queue
+and no queries.
+
+With ``PUBSUB_BACKEND = "local"`` messages only reach subscribers in the publishing
+process, which is enough for a single ASGI process serving both the API and the streams.
+With ``"postgres"`` every message goes through ``pg_notify`` and a listener thread in each
+subscribing process hands it to its local subscribers, so a write served by any worker,
+WSGI or ASGI, reaches streams held by any other.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "budget_pubsub"
+REFRESH = {"type": "refresh"}
+
+_subscriptions = {}  # {topic: {subscription, ...}}
+_lock = threading.Lock()
+_listener = None
+
+
+class Subscription:
+    def __init__(self, topic):
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.PUBSUB_QUEUE_SIZE)
+
+    def put(self, message):
+        """Runs in the subscriber's loop."""
+        if self.queue.full():
+            # A reader this far behind has lost track anyway; tell it to start over.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = REFRESH
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+def subscribe(topic):
+    """Start receiving the messages published to ``topic``; call from the event loop."""
+    subscription = Subscription(topic)
+    with _lock:
+        _subscriptions.setdefault(topic, set()).add(subscription)
+    if settings.PUBSUB_BACKEND == "postgres":
+        _start_listener()
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subscribers = _subscriptions.get(subscription.topic, set())
+        subscribers.discard(subscription)
+        if not subscribers:
+            _subscriptions.pop(subscription.topic, None)
+
+
+def subscriber_count(topic):
+    return len(_subscriptions.get(topic, ()))
+
+
+def has_subscribers(topic):
+    """Whether a message to ``topic`` may reach anyone.
+
+    Always true with the postgres backend, whose subscribers may be in other processes.
+    """
+    return settings.PUBSUB_BACKEND == "postgres" or topic in _subscriptions
+
+
+def deliver(topic, message):
+    """Hand ``message`` to this process's subscribers of ``topic``; safe from any thread."""
+    with _lock:
+        subscribers = list(_subscriptions.get(topic, ()))
+    for subscription in subscribers:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.put, message)
+        except RuntimeError:  # the loop has been closed
+            unsubscribe(subscription)
+
+
+def publish(topic, message):
+    """Send a JSON-serializable ``message`` to every subscriber of ``topic``.
+
+    Call it once the change is committed (e.g. from ``transaction.on_commit``); on
+    PostgreSQL a notification sent inside a transaction is only delivered at commit.
+    Values are encoded like API responses, so decimals arrive as numbers either way.
+    """
+    if settings.PUBSUB_BACKEND != "postgres":
+        deliver(topic, message)
+        return
+    payload = json.dumps({"topic": topic, "message": message}, cls=JSONEncoder)
+    try:
+        with connections["default"].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+    except Exception:
+        # Live updates are best effort; the write itself has already succeeded.
+        logger.exception("Could not publish to %s", topic)
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name="pubsub-listener", daemon=True)
+            _listener.start()
+
+
+def _listen():
+    """LISTEN on a dedicated connection for as long as the process runs (psycopg2)."""
+    backoff = 1
+    while True:
+        connection = connections.create_connection("default")
+        try:
+            connection.ensure_connection()
+            raw = connection.connection
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            backoff = 1
+            while True:
+                if select.select([raw], [], [], settings.PUBSUB_LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notification = json.loads(raw.notifies.pop(0).payload)
+                    deliver(notification["topic"], notification["message"])
+        except Exception:
+            logger.exception("Pub/sub listener lost its connection; reconnecting in %ss", backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+        finally:
+            connection.close()
@@ -50,17 +50,23 @@ INSTALLED_APPS = [
     "drf_yasg",
     # Local apps
     "expenses",
+    "jobs",
+    "households",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "budgetbackend.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "budgetbackend.middleware.RateLimitHeadersMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "budgetbackend.sharding.ShardMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "expenses.middleware.ChangeHistoryMiddleware",
 ]
 
 ROOT_URLCONF = "budgetbackend.urls"
@@ -68,7 +74,7 @@ ROOT_URLCONF = "budgetbackend.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -98,6 +104,41 @@ DATABASES = {
     }
 }
 
+# Sharding (see budgetbackend/sharding.py)
+# Per-user data is spread over DATABASE_SHARDS; "default" is always the first shard.
+# DB_SHARD_NAMES adds PostgreSQL shards on the default server, e.g. "budget_1,budget_2";
+# SQLITE_SHARDS=N runs default and N extra shards on local SQLite files instead.
+# Run `manage.py migrate --database <alias>` for every shard.
+if os.getenv("SQLITE_SHARDS"):
+    DATABASES = {
+        alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"{alias}.sqlite3"}
+        for alias in ["default"] + [f"shard_{i}" for i in range(1, int(os.getenv("SQLITE_SHARDS")) + 1)]
+    }
+else:
+    for index, name in enumerate(filter(None, os.getenv("DB_SHARD_NAMES", "").split(",")), start=1):
+        DATABASES[f"shard_{index}"] = {**DATABASES["default"], "NAME": name.strip()}
+DATABASE_SHARDS = list(DATABASES)
+DATABASE_ROUTERS = ["budgetbackend.sharding.ShardRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set REDIS_URL to share throttles and cached data across workers.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -151,12 +192,108 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Token buckets: N requests of burst, refilled at N per period (see budgetbackend/throttling.py).
+    "DEFAULT_THROTTLE_CLASSES": [
+        "budgetbackend.throttling.ReadRateThrottle",
+        "budgetbackend.throttling.WriteRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "read": os.getenv("THROTTLE_READ_RATE", "600/min"),
+        "write": os.getenv("THROTTLE_WRITE_RATE", "120/min"),
+    },
+    "EXCEPTION_HANDLER": "budgetbackend.exceptions.exception_handler",
 }
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 
 # Swagger settings
+# The docs views and drf_yasg's generator are imported lazily on the first docs request.
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "1") == "1"
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {"Token": {"type": "apiKey", "name": "Authorization", "in": "header"}},
+    "SPEC_URL": "openapi-schema",
 }
+REDOC_SETTINGS = {
+    "SPEC_URL": "openapi-schema",
+}
+
+# The OpenAPI document is generated per code version by `manage.py build_api_schema`
+# into API_SCHEMA_DIR and served from memory with a strong ETag.
+CODE_VERSION = os.getenv("CODE_VERSION", "dev")
+API_SCHEMA_DIR = BASE_DIR / "openapi"
+API_SCHEMA_MAX_AGE = 60 * 60
+
+# Startup settings
+# Cold-start budget for one worker (settings, app registry, WSGI handler and URLconf),
+# measured by `manage.py startup_profile --check`.
+STARTUP_TIME_TARGET_MS = int(os.getenv("STARTUP_TIME_TARGET_MS", "800"))
+
+# Analytics settings
+ANALYTICS_MAX_MONTHS = 36
+ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 24 * 31  # closed months only change when their expenses are edited
+
+# Sync settings
+SYNC_RECENT_EXPENSES = 500  # expenses sent on a full sync
+SYNC_TOMBSTONE_RETENTION_DAYS = 90  # clients older than this get a full sync
+SYNC_WATERMARK_MARGIN = 60  # seconds; longer than any write transaction is expected to run
+
+# Background job settings
+JOB_LOCK_TIMEOUT = 15 * 60  # running jobs without a progress update for this long are requeued
+JOB_RETRY_BACKOFF = 30  # seconds before the first retry, doubled on every further attempt
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+
+# Currency settings
+DEFAULT_CURRENCY = "USD"  # base currency of new users
+FX_PIVOT_CURRENCY = "EUR"  # imported rates are units of a currency per one pivot unit
+
+# Household settings
+HOUSEHOLD_ROLES_CACHE_TIMEOUT = 5  # seconds; bounds how long other processes may use roles from before a change
+
+# Response compression (Brotli when the brotli package is installed, otherwise gzip)
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_GZIP_LEVEL = 6
+
+# Idempotency settings
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # seconds a stored response is replayed for
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds before an unfinished request's key can be taken over
+
+# Categorization rule settings
+RULES_MATCHER_CACHE_SIZE = 1000  # compiled per-user rule matchers kept in each process
+RULES_REGEX_MAX_LENGTH = 100  # longest pattern accepted for a regex rule
+
+# Admin settings
+ADMIN_COUNT_LIMIT = 10000  # changelists count at most this many matching rows
+ADMIN_ACTION_BATCH_SIZE = 1000  # rows per transaction in bulk admin actions
+
+# Sharding settings
+# Processes cache user placements this long; rebalance_shards waits as long between its steps.
+SHARD_PLACEMENT_CACHE_TIMEOUT = 60
+
+# Archive settings
+# `manage.py archive_expenses` moves years before the last ARCHIVE_AFTER_YEARS out of the
+# expense table into per-user columnar files under ARCHIVE_DIR (shared by all web hosts).
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", BASE_DIR / "archive")
+ARCHIVE_AFTER_YEARS = 2
+ARCHIVE_OPEN_YEARS = 256  # memory-mapped user years kept open in each process
+
+# Live update settings
+# "local" reaches streams in the publishing process only; "postgres" fans out through
+# LISTEN/NOTIFY on the default database to every ASGI process holding streams.
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+PUBSUB_QUEUE_SIZE = 100  # undelivered messages per stream before it is sent a fresh snapshot
+PUBSUB_LISTEN_TIMEOUT = 5  # seconds the listener waits for notifications between checks
+LIVE_KEEPALIVE_INTERVAL = 15  # seconds between comment lines that keep proxies from closing idle streams
+LIVE_STREAM_MAX_AGE = 10 * 60  # seconds before a stream ends and the client reconnects
+LIVE_RETRY_MS = 3000  # reconnect delay sent to clients; also the polling interval under WSGI
+LIVE_MAX_STREAMS_PER_USER = 10
+LIVE_STREAM_TOKEN_MAX_AGE = 60  # seconds a token from /api/live/token/ can open streams
+
+# Forecast settings
+FORECAST_MAX_MONTHS = 12  # months after the current one that are forecast (and cached)
+FORECAST_HISTORY_MONTHS = 36  # closed months of rollups fitted, at most ANALYTICS_MAX_MONTHS
+FORECAST_SMOOTHING = 0.3  # weight of the latest month in the smoothed level
+FORECAST_SEASONAL_MIN_MONTHS = 24  # closed months needed before month-of-year patterns are used
+FORECAST_CACHE_TIMEOUT = 60 * 60 * 24  # forecasts are also dropped on every expense write and at midnight
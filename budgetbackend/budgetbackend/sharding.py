@@ -0,0 +1,346 @@
+"""Horizontal sharding of per-user data by user id.
+
+Categories, expenses and the rows hanging off them (``SHARDED_MODELS``) live on the shard
+of their user; everything else, including the user table itself and ``UserShard``, lives
+on ``default``, which is also the first shard. With a single entry in
+``settings.DATABASE_SHARDS`` the router sends everything to ``default``.
+
+* New users are placed by a stable hash of their id and the choice is recorded in
+  ``UserShard``; users without a row (created before sharding) are on ``default``.
+  ``manage.py rebalance_shards`` moves users between shards.
+* Queries are routed by the ``user_id`` of the instance involved when there is one, else
+  by an explicit :func:`for_user` or :func:`on_shard` block, else by the user of the
+  current request (``ShardMiddleware``), else to ``default``. Code that works across
+  users, such as commands and scans, loops over :func:`shards` itself.
+* Each user row is copied to the user's shard so foreign keys hold there. Rows with no
+  user (system categories, system rules and their tombstones) are reference data: they
+  are written on ``default`` and copied to every shard with the same primary key.
+* Primary keys of sharded tables start at ``index * SHARD_ID_SPACING`` on each shard, so
+  they are unique across shards and rows keep their ids when their user moves.
+"""
+
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from accounts.models import User, UserShard
+
+SHARDED_MODELS = frozenset(
+    {
+        "expenses.category",
+        "expenses.expense",
+        "expenses.tombstone",
+        "expenses.changerecord",
+        "expenses.categorizationrule",
+        "expenses.duplicatecandidate",
+        "expenses.archivedyear",
+    }
+)
+SHARD_ID_SPACING = 2**40
+
+_override = ContextVar("shard_override", default=None)
+_request = ContextVar("shard_request", default=None)
+_replicating = ContextVar("shard_replicating", default=False)
+
+
+class UserMoving(Exception):
+    """Raised by the router for writes of a user whose data is being copied to another shard.
+
+    API views answer it with a 503 (see ``budgetbackend.exceptions``), other views through
+    ``ShardMiddleware``.
+    """
+
+    message = "Your data is being moved; try again in a minute."
+
+    def __init__(self, message=message):
+        super().__init__(message)
+
+
+def shards():
+    return settings.DATABASE_SHARDS
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def stable_shard(user_id):
+    return shards()[zlib.crc32(str(user_id).encode()) % len(shards())]
+
+
+def _cache_key(user_id):
+    return f"shard:user:{user_id}"
+
+
+def placement(user_id):
+    """Return ``(shard, moving_to)`` for a user."""
+    key = _cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        row = UserShard.objects.filter(user_id=user_id).values_list("shard", "moving_to").first()
+        cached = row or (DEFAULT_DB_ALIAS, "")
+        cache.set(key, cached, settings.SHARD_PLACEMENT_CACHE_TIMEOUT)
+    return cached
+
+
+def invalidate_placement(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def shard_for_user(user_id):
+    if len(shards()) == 1:
+        return DEFAULT_DB_ALIAS
+    return placement(user_id)[0]
+
+
+def shard_for_pk(model, pk):
+    """Return the shard holding the row ``pk`` of a sharded model, looking on every shard if need be.
+
+    Rows are created in the id range of their shard and keep their id when their user
+    moves, so the shard the range belongs to is tried first.
+    """
+    home = DEFAULT_DB_ALIAS
+    if 0 <= pk // SHARD_ID_SPACING < len(shards()):
+        home = shards()[pk // SHARD_ID_SPACING]
+    for alias in [home, *(alias for alias in shards() if alias != home)]:
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    return home
+
+
+def group_by_shard(user_ids):
+    """Return ``{shard: [user_id, ...]}``."""
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_for_user(user_id), []).append(user_id)
+    return groups
+
+
+@contextmanager
+def on_shard(alias, user_id=None):
+    """Route queries on sharded models that carry no other clue to ``alias``."""
+    token = _override.set((alias, user_id))
+    try:
+        yield alias
+    finally:
+        _override.reset(token)
+
+
+@contextmanager
+def for_user(user_id):
+    with on_shard(shard_for_user(user_id), user_id) as alias:
+        yield alias
+
+
+def current_user_id():
+    override = _override.get()
+    if override is not None:
+        return override[1]
+    user = getattr(_request.get(), "user", None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def current_shard():
+    override = _override.get()
+    if override is not None:
+        return override[0]
+    user_id = current_user_id()
+    return DEFAULT_DB_ALIAS if user_id is None else shard_for_user(user_id)
+
+
+class ShardMiddleware:
+    """Route the queries of a request by the user it authenticates.
+
+    Views that work across users, such as the admin, pick a shard themselves with
+    :func:`on_shard`, which takes precedence.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # DRF's authentication copies the user it authenticates onto this request.
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, UserMoving):
+            return HttpResponse(str(exception), status=503, content_type="text/plain")
+        return None
+
+
+class ShardRouter:
+    def _instance_user(self, instance):
+        """Return ``(has_user_field, user_id)``."""
+        if isinstance(instance, User):
+            return True, instance.pk
+        return hasattr(instance, "user_id"), getattr(instance, "user_id", None)
+
+    def _route(self, model, hints):
+        instance = hints.get("instance")
+        if instance is not None:
+            has_user, user_id = self._instance_user(instance)
+            if user_id is not None:
+                return shard_for_user(user_id), user_id
+            if has_user:
+                # Reference rows are written on default and read wherever they were loaded from.
+                return instance._state.db or DEFAULT_DB_ALIAS, None
+        return current_shard(), current_user_id()
+
+    def db_for_read(self, model, **hints):
+        if len(shards()) == 1 or not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        return self._route(model, hints)[0]
+
+    def db_for_write(self, model, **hints):
+        if len(shards()) == 1 or not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        alias, user_id = self._route(model, hints)
+        if user_id is not None and not is_replicating() and placement(user_id)[1]:
+            raise UserMoving()
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users and reference rows are copied to every shard that needs them.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every database gets every table; unused ones simply stay empty.
+        return None
+
+
+@contextmanager
+def replicating():
+    """Mark writes that move rows, between shards or into the archive, rather than change them."""
+    token = _replicating.set(True)
+    try:
+        yield
+    finally:
+        _replicating.reset(token)
+
+
+def is_replicating():
+    return _replicating.get()
+
+
+def copy_row(instance, alias):
+    """Insert or overwrite ``instance`` on ``alias`` with the same primary key, without signals."""
+    model = type(instance)
+    values = {field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields}
+    pk = values.pop(model._meta.pk.attname)
+    with replicating():
+        if not model._base_manager.using(alias).filter(pk=pk).update(**values):
+            # bulk_create would refresh auto_now(_add) timestamps; the update below restores them.
+            model._base_manager.using(alias).bulk_create([model(pk=pk, **values)])
+            model._base_manager.using(alias).filter(pk=pk).update(**values)
+
+
+@receiver(post_save, sender=User)
+def place_user(sender, instance, created, using, update_fields=None, **kwargs):
+    if using != DEFAULT_DB_ALIAS or len(shards()) == 1 or is_replicating():
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    if created:
+        UserShard.objects.get_or_create(user=instance, defaults={"shard": stable_shard(instance.pk)})
+        invalidate_placement(instance.pk)
+    shard, moving_to = placement(instance.pk)
+    for alias in {shard, moving_to} - {"", DEFAULT_DB_ALIAS}:
+        copy_row(instance, alias)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_copies(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS or len(shards()) == 1 or is_replicating():
+        return
+    with replicating():
+        for alias in shards():
+            if alias != DEFAULT_DB_ALIAS:
+                # Cascades to the user's rows on that shard.
+                User.objects.using(alias).filter(pk=instance.pk).delete()
+    invalidate_placement(instance.pk)
+
+
+def _replicate_reference_save(sender, instance, using, **kwargs):
+    if instance.user_id is not None or using != DEFAULT_DB_ALIAS or is_replicating():
+        return
+    for alias in shards():
+        if alias != DEFAULT_DB_ALIAS:
+            copy_row(instance, alias)
+
+
+def _replicate_reference_delete(sender, instance, using, **kwargs):
+    if instance.user_id is not None or using != DEFAULT_DB_ALIAS or is_replicating():
+        return
+    with replicating():
+        for alias in shards():
+            if alias != DEFAULT_DB_ALIAS:
+                sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def connect_signals(apps):
+    if len(shards()) == 1:
+        return
+    for label in SHARDED_MODELS:
+        model = apps.get_model(label)
+        if any(field.name == "user" and field.null for field in model._meta.fields):
+            post_save.connect(_replicate_reference_save, sender=model, dispatch_uid=f"shard-save-{label}")
+            post_delete.connect(
+                _replicate_reference_delete, sender=model, dispatch_uid=f"shard-delete-{label}"
+            )
+
+
+def reset_sequences(alias, apps=None, app_label=None):
+    """Point id allocation of the sharded tables on ``alias`` into the shard's own range.
+
+    That range starts at ``index * SHARD_ID_SPACING``. Needed once after migrating, and on
+    SQLite also after copying rows in, because inserting explicit ids moves its counters
+    (PostgreSQL sequences are not affected by them).
+    """
+    start = shards().index(alias) * SHARD_ID_SPACING
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for label in SHARDED_MODELS:
+            if app_label is not None and label.split(".")[0] != app_label:
+                continue
+            try:
+                table = (apps or django_apps).get_model(label)._meta.db_table
+            except LookupError:  # not created by the migrations applied so far
+                continue
+            own_max = (
+                f"SELECT COALESCE(MAX(id), %s) FROM {connection.ops.quote_name(table)} "
+                f"WHERE id >= %s AND id < %s"
+            )
+            params = [start, start, start + SHARD_ID_SPACING]
+            if connection.vendor == "postgresql":
+                # Never moves a sequence backwards, which could hand out ids of in-flight inserts again.
+                cursor.execute(
+                    f"SELECT setval(sequence, GREATEST(({own_max}) + 1, "
+                    f"COALESCE(pg_sequence_last_value(sequence) + 1, 0)), false) "
+                    f"FROM CAST(pg_get_serial_sequence(%s, 'id') AS regclass) AS sequence",
+                    [*params, table],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute(
+                    f"INSERT INTO sqlite_sequence (name, seq) VALUES (%s, ({own_max}))", [table, *params]
+                )
+
+
+@receiver(post_migrate)
+def offset_sequences(sender, app_config=None, using=DEFAULT_DB_ALIAS, apps=None, **kwargs):
+    if using in shards() and shards().index(using) > 0 and apps is not None:
+        reset_sequences(using, apps, sender.label)
@@ -0,0 +1,142 @@
+"""Token-bucket throttles backed by the Django cache.
+
+Every client (auth token, else user, else IP address) has one bucket per scope. A bucket
+holds up to N tokens and refills continuously at N per period, so clients may burst up to
+N requests and then sustain the configured rate. Each request takes one token.
+
+Buckets are updated atomically: with a Redis cache in a single Lua script, otherwise
+under a process-wide lock (exact for the local-memory cache, which is per process).
+Rates come from ``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]`` and can be overridden per
+view with a ``throttle_rates`` dict, e.g. ``throttle_rates = {"write": "30/min"}``. A view
+with an override gets its own bucket so it does not drain the default one.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.core.cache import cache as default_cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / refill_rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Return ``(capacity, tokens_per_second)`` for a rate such as ``"120/min"``."""
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def _redis_client(cache):
+    # django.core.cache.backends.redis.RedisCache
+    client = getattr(cache, "_cache", None)
+    if client is not None and hasattr(client, "get_client"):
+        return client.get_client(write=True)
+    # django-redis
+    client = getattr(cache, "client", None)
+    if client is not None and hasattr(client, "get_client"):
+        return client.get_client(write=True)
+    return None
+
+
+def take_token(cache, key, capacity, refill_rate):
+    """Take one token from the bucket at ``key``; return ``(allowed, tokens_left)``."""
+    now = time.time()
+    redis = _redis_client(cache)
+    if redis is not None:
+        allowed, tokens = redis.eval(TAKE_TOKEN_SCRIPT, 1, cache.make_key(key), capacity, refill_rate, now)
+        return bool(allowed), float(tokens)
+
+    with _lock:
+        tokens, updated_at = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), math.ceil(capacity / refill_rate) + 1)
+    return allowed, tokens
+
+
+class TokenBucketThrottle(BaseThrottle):
+    cache = default_cache
+    scope = None
+    THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+
+    def applies_to(self, request):
+        return True
+
+    def get_rate(self, view):
+        """Return ``(rate, bucket_name)`` for the view, using its override when it has one."""
+        override = getattr(view, "throttle_rates", {}).get(self.scope)
+        if override:
+            return override, f"{self.scope}:{type(view).__name__}"
+        return self.THROTTLE_RATES.get(self.scope), self.scope
+
+    def get_client_key(self, request):
+        token = getattr(request.auth, "key", None)
+        if token:
+            # Hash so raw API tokens never end up in the cache.
+            return "token:" + hashlib.sha256(token.encode()).hexdigest()[:24]
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        if not self.applies_to(request):
+            return True
+        rate, bucket = self.get_rate(view)
+        if rate is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        key = f"throttle:{bucket}:{self.get_client_key(request)}"
+        allowed, tokens = take_token(self.cache, key, capacity, refill_rate)
+        self.wait_seconds = 0 if allowed else (1 - tokens) / refill_rate
+        # Picked up by RateLimitHeadersMiddleware.
+        request._request.rate_limit = {
+            "limit": capacity,
+            "remaining": int(tokens),
+            "reset": math.ceil((capacity - tokens) / refill_rate),
+        }
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ReadRateThrottle(TokenBucketThrottle):
+    scope = "read"
+
+    def applies_to(self, request):
+        return request.method in SAFE_METHODS
+
+
+class WriteRateThrottle(TokenBucketThrottle):
+    scope = "write"
+
+    def applies_to(self, request):
+        return request.method not in SAFE_METHODS
@@ -15,26 +15,23 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Home Budget API",
-        default_version="v1",
-        description="API for Home Budget Application",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from . import docs
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("accounts.urls")),
     path("api/", include("expenses.urls")),
-    path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path("api/jobs/", include("jobs.urls")),
+    path("api/households/", include("households.urls")),
 ]
+
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [
+        path("openapi.json", docs.openapi_json, name="openapi-schema"),
+        path("swagger/", docs.swagger_ui, name="schema-swagger-ui"),
+        path("redoc/", docs.redoc_ui, name="schema-redoc"),
+    ]
@@ -1,3 +1,141 @@
-from django.contrib import admin
+from itertools import groupby, islice
+from operator import itemgetter
 
-# Register your models here.
+from django.conf import settings
+from django.contrib import admin, messages
+from django.db import router, transaction
+
+from accounts.models import User
+from budgetbackend.admin import ScalableModelAdmin, ShardedModelAdmin
+from jobs.queue import enqueue
+
+from . import tombstones
+from .models import CategorizationRule, Category, ChangeRecord, DuplicateCandidate, ExchangeRate, Expense
+
+
+class OwnerFilter(admin.SimpleListFilter):
+    title = "owner"
+    parameter_name = "owner"
+
+    def lookups(self, request, model_admin):
+        return [("system", "System"), ("user", "Users")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "system":
+            return queryset.filter(user__isnull=True)
+        if self.value() == "user":
+            return queryset.filter(user__isnull=False)
+        return queryset
+
+
+@admin.register(Category)
+class CategoryAdmin(ShardedModelAdmin):
+    list_display = ("id", "name", "user", "updated_at")
+    list_select_related = ("user",)
+    list_filter = (OwnerFilter,)
+    # Exact lookups only: the (name, user) unique index and the username index serve them.
+    search_fields = ("name__exact", "user__username__exact")
+    search_help_text = "Exact category name or username"
+    raw_id_fields = ("user",)
+    ordering = ("-pk",)
+    delete_batch_context = staticmethod(tombstones.batched_deletes)
+
+    def delete_model(self, request, obj):
+        # Takes the category's expenses with it.
+        using = router.db_for_write(Category, instance=obj)
+        with transaction.atomic(using=using), tombstones.batched_deletes():
+            super().delete_model(request, obj)
+
+
+@admin.action(description="Re-apply categorization rules to selected expenses")
+def recategorize(modeladmin, request, queryset):
+    # Rules are per user, so the selection is queued as background jobs per owner, each with
+    # at most ADMIN_ACTION_BATCH_SIZE expenses. Ordering by owner streams one owner at a time.
+    batch_size = settings.ADMIN_ACTION_BATCH_SIZE
+    rows = queryset.order_by("user_id", "pk").values_list("user_id", "pk").iterator(chunk_size=batch_size)
+    job_ids = []
+    for user_id, owned in groupby(rows, key=itemgetter(0)):
+        owner = User.objects.get(pk=user_id)
+        while True:
+            pks = [pk for _, pk in islice(owned, batch_size)]
+            if not pks:
+                break
+            job = enqueue(
+                "expenses.recategorize", user=owner, payload={"user_id": user_id, "expense_ids": pks}
+            )
+            job_ids.append(job.pk)
+    if len(job_ids) == 1:
+        message = f"Queued recategorization job #{job_ids[0]}."
+    else:
+        message = f"Queued {len(job_ids)} recategorization jobs (#{job_ids[0]} to #{job_ids[-1]})."
+    modeladmin.message_user(request, message, messages.SUCCESS)
+
+
+@admin.register(Expense)
+class ExpenseAdmin(ShardedModelAdmin):
+    list_display = (
+        "id",
+        "description",
+        "amount",
+        "currency",
+        "base_amount",
+        "category",
+        "user",
+        "created_at",
+    )
+    list_select_related = ("user", "category__user")
+    list_filter = (("created_at", admin.DateFieldListFilter),)
+    search_fields = ("user__username__exact",)
+    search_help_text = "Exact username"
+    raw_id_fields = ("user", "category")
+    readonly_fields = ("base_amount", "exchange_rate", "fingerprint", "created_at", "updated_at")
+    delete_batch_context = staticmethod(tombstones.batched_deletes)
+    actions = ScalableModelAdmin.actions + [recategorize]
+
+
+@admin.register(CategorizationRule)
+class CategorizationRuleAdmin(ShardedModelAdmin):
+    list_display = ("id", "match_type", "pattern", "min_amount", "max_amount", "priority", "category", "user")
+    list_select_related = ("user", "category__user")
+    list_filter = (OwnerFilter, "match_type")
+    search_fields = ("user__username__exact",)
+    search_help_text = "Exact username"
+    raw_id_fields = ("user", "category")
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(ScalableModelAdmin):
+    list_display = ("date", "currency", "rate")
+    search_fields = ("currency__exact",)
+    search_help_text = "Currency code, e.g. GBP"
+    ordering = ("-date", "currency")
+
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(ShardedModelAdmin):
+    list_display = ("id", "expense", "duplicate_of", "user", "created_at", "dismissed_at")
+    list_select_related = ("user", "expense", "duplicate_of")
+    search_fields = ("user__username__exact",)
+    search_help_text = "Exact username"
+    raw_id_fields = ("user", "expense", "duplicate_of")
+    ordering = ("-pk",)
+
+
+@admin.register(ChangeRecord)
+class ChangeRecordAdmin(ShardedModelAdmin):
+    list_display = ("id", "action", "model", "object_id", "user", "actor", "changed_at")
+    list_select_related = ("user", "actor")
+    search_fields = ("user__username__exact",)
+    search_help_text = "Exact username"
+    ordering = ("-pk",)
+    actions = []
+
+    # The history is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
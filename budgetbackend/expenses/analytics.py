@@ -0,0 +1,198 @@
+"""Vectorized spending statistics.
+
+A user's expenses are pulled as columnar NumPy arrays in a single query (archived years
+from their memory-mapped files) and every statistic is computed on whole arrays. Closed
+months only change when one of their expenses is edited, so their statistics are cached
+and only the months missing from the cache (always including the current one) are
+recomputed.
+"""
+
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear, Round
+from django.utils import timezone
+
+from . import archive
+from .cache import analytics_month_key
+from .models import Category, Expense
+
+PERCENTILES = (25, 50, 75, 90, 95)
+
+# Modified z-score (Iglewicz & Hoaglin) above which an expense is flagged as unusual.
+ANOMALY_THRESHOLD = 3.5
+ANOMALY_MIN_SAMPLE = 5
+
+
+def _month_start(month):
+    return datetime.fromisoformat(f"{month}-01").replace(tzinfo=dt_timezone.utc)
+
+
+def current_month():
+    return np.datetime64(timezone.now().strftime("%Y-%m"), "M")
+
+
+def month_window(months, until=None):
+    """Return the last ``months`` months, oldest first, as ``YYYY-MM`` strings."""
+    until = current_month() if until is None else np.datetime64(until, "M")
+    return list((until - np.arange(months - 1, -1, -1)).astype(str))
+
+
+def _table_columns(user_id, since):
+    # Cents and month numbers come out of the database as integers, so the rows convert
+    # to one array without any per-row Decimal or datetime arithmetic.
+    rows = list(
+        Expense.objects.filter(user_id=user_id, created_at__gte=since)
+        .annotate(
+            cents=Cast(Round(F("base_amount") * 100), BigIntegerField()),
+            month=(ExtractYear("created_at", tzinfo=dt_timezone.utc) - 1970) * 12
+            + ExtractMonth("created_at", tzinfo=dt_timezone.utc)
+            - 1,
+        )
+        .order_by("created_at")
+        .values_list("id", "category_id", "cents", "month")
+    )
+    table = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    return {
+        "ids": table[:, 0],
+        "category_ids": table[:, 1],
+        "cents": table[:, 2],
+        "months": table[:, 3].astype("datetime64[M]"),
+    }
+
+
+def load_columns(user_id, since):
+    """Fetch a user's expenses created since ``since`` as columnar arrays sorted by time.
+
+    Rows of archived years, which are older than any left in the table, come from their
+    memory-mapped files.
+    """
+    columns = _table_columns(user_id, since)
+    archived = archive.columns_since(user_id, since)
+    if archived is None:
+        return columns
+    archived["months"] = archived.pop("created").astype("datetime64[M]")
+    return {name: np.concatenate([archived[name], column]) for name, column in columns.items()}
+
+
+def anomaly_mask(amounts):
+    """Flag amounts whose modified z-score exceeds ``ANOMALY_THRESHOLD`` on the high side."""
+    if amounts.size < ANOMALY_MIN_SAMPLE:
+        return np.zeros(amounts.size, dtype=bool)
+    median = np.median(amounts)
+    mad = np.median(np.abs(amounts - median))
+    if mad == 0:
+        return np.zeros(amounts.size, dtype=bool)
+    return 0.6745 * (amounts - median) / mad > ANOMALY_THRESHOLD
+
+
+def summarize(ids, category_ids, cents):
+    """Statistics for one slice of columnar expense data."""
+    count = int(cents.size)
+    if not count:
+        return {
+            "count": 0,
+            "total_cents": 0,
+            "average": None,
+            "median": None,
+            "percentiles": {},
+            "by_category": [],
+            "anomalies": [],
+        }
+
+    amounts = cents / 100.0
+    categories, inverse = np.unique(category_ids, return_inverse=True)
+    category_cents = np.bincount(inverse, weights=cents).astype(np.int64)
+    return {
+        "count": count,
+        "total_cents": int(cents.sum()),
+        "average": round(float(amounts.mean()), 2),
+        "median": round(float(np.median(amounts)), 2),
+        "percentiles": {
+            f"p{p}": round(float(value), 2)
+            for p, value in zip(PERCENTILES, np.percentile(amounts, PERCENTILES))
+        },
+        "by_category": list(zip(categories.tolist(), category_cents.tolist())),
+        "anomalies": ids[anomaly_mask(amounts)].tolist(),
+    }
+
+
+def monthly_statistics(user_id, window):
+    """Per-month statistics for ``window`` (``YYYY-MM`` strings, oldest first).
+
+    Every month except the last one is closed and served from the cache when present.
+    All missing months are computed from a single query.
+    """
+    closed_keys = {month: analytics_month_key(user_id, month) for month in window[:-1]}
+    cached = cache.get_many(closed_keys.values())
+    missing = [month for month in window if closed_keys.get(month) not in cached]
+
+    columns = load_columns(user_id, since=_month_start(missing[0]))
+    computed = {}
+    for month in missing:
+        bucket = np.datetime64(month, "M")
+        lo, hi = np.searchsorted(columns["months"], [bucket, bucket + 1])
+        computed[month] = summarize(
+            columns["ids"][lo:hi], columns["category_ids"][lo:hi], columns["cents"][lo:hi]
+        )
+
+    cache.set_many(
+        {closed_keys[month]: computed[month] for month in missing if month in closed_keys},
+        settings.ANALYTICS_CACHE_TIMEOUT,
+    )
+    return [
+        dict(computed[month] if month in computed else cached[closed_keys[month]], month=month)
+        for month in window
+    ]
+
+
+def build_report(user, months=12):
+    stats = monthly_statistics(user.pk, month_window(months))
+
+    counts = np.array([month["count"] for month in stats], dtype=np.int64)
+    totals = np.array([month["total_cents"] for month in stats], dtype=np.int64)
+    previous = totals[:-1].astype(np.float64)
+    growth = np.full(totals.size, np.nan)
+    np.divide(totals[1:] - previous, previous, out=growth[1:], where=previous != 0)
+
+    category_ids = np.array([cid for month in stats for cid, _ in month["by_category"]], dtype=np.int64)
+    category_cents = np.array([cents for month in stats for _, cents in month["by_category"]], dtype=np.int64)
+    categories, inverse = np.unique(category_ids, return_inverse=True)
+    category_totals = np.bincount(inverse, weights=category_cents, minlength=categories.size)
+    order = np.argsort(-category_totals, kind="stable")
+    names = dict(Category.objects.filter(id__in=categories.tolist()).values_list("id", "name"))
+
+    total_cents = int(totals.sum())
+    count = int(counts.sum())
+    return {
+        "months": [
+            {
+                "month": month["month"],
+                "count": month["count"],
+                "total": month["total_cents"] / 100,
+                "average": month["average"],
+                "median": month["median"],
+                "percentiles": month["percentiles"],
+                "growth": None if np.isnan(change) else round(float(change) * 100, 2),
+                "anomalies": month["anomalies"],
+            }
+            for month, change in zip(stats, growth)
+        ],
+        "total": total_cents / 100,
+        "count": count,
+        "average": round(total_cents / count / 100, 2) if count else None,
+        "by_category": [
+            {
+                "category_id": int(categories[i]),
+                "category__name": names.get(int(categories[i])),
+                "total": round(float(category_totals[i]) / 100, 2),
+                "share": round(float(category_totals[i]) / total_cents * 100, 2),
+            }
+            for i in order
+        ],
+        "period_start": _month_start(stats[0]["month"]).date(),
+    }
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "expenses"
+
+    def ready(self):
+        from budgetbackend import sharding
+
+        from . import signals  # noqa: F401
+
+        sharding.connect_signals(self.apps)
@@ -0,0 +1,255 @@
+"""Cold storage of closed years in per-user columnar files.
+
+``manage.py archive_expenses`` moves the expenses of years older than
+``ARCHIVE_AFTER_YEARS`` out of the ``Expense`` table into one directory per user and
+year under ``ARCHIVE_DIR``, holding a ``.npy`` array per column (``COLUMNS``) sorted by
+time. An :class:`ArchivedYear` row marks the year and names the current version of its
+files; rewrites go to a new version that is switched to in the same transaction that
+changes the table, so readers never count a row twice.
+
+Readers memory-map the arrays: a yearly summary only faults in the pages it touches and
+worker processes share them through the page cache. Archived expenses are read-only and
+no longer listed or synced. Rows whose category has been deleted since are skipped, as
+the cascade would have removed them from the table.
+"""
+
+import shutil
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from budgetbackend import sharding
+
+from . import currency, live
+from .cache import invalidate_forecast
+from .models import ArchivedYear, Category, Expense
+
+COLUMNS = {
+    "ids": np.int64,
+    "created": "datetime64[us]",  # UTC
+    "category_ids": np.int64,
+    "cents": np.int64,  # base_amount
+    "amount_cents": np.int64,
+    "currencies": "S3",
+}
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+# {path: columns}, least recently used first. Files of a version never change.
+_open = OrderedDict()
+
+
+def year_path(user_id, year, version):
+    return Path(settings.ARCHIVE_DIR) / str(user_id) / f"{year}.v{version}"
+
+
+def year_bounds(year):
+    """Start and end of ``year`` in the current time zone, like ``created_at__year`` lookups."""
+    return timezone.make_aware(datetime(year, 1, 1)), timezone.make_aware(datetime(year + 1, 1, 1))
+
+
+def to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def read_year(path):
+    """Memory-map the columns stored at ``path``."""
+    columns = _open.get(path)
+    if columns is not None:
+        _open.move_to_end(path)
+        return columns
+    columns = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in COLUMNS}
+    _open[path] = columns
+    while len(_open) > settings.ARCHIVE_OPEN_YEARS:
+        _open.popitem(last=False)
+    return columns
+
+
+def write_year(path, columns):
+    shutil.rmtree(path, ignore_errors=True)  # left behind by an interrupted run
+    path.mkdir(parents=True)
+    for name, dtype in COLUMNS.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(columns[name], dtype=dtype))
+
+
+def remove_old_versions(user_id, year, version):
+    """Delete the files of versions before ``version - 1``.
+
+    The previous version is kept because requests that looked it up just before the
+    switch may still be opening it.
+    """
+    for path in year_path(user_id, year, version).parent.glob(f"{year}.v*"):
+        if int(path.suffix[2:]) < version - 1:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_files(user_id, year=None):
+    root = Path(settings.ARCHIVE_DIR) / str(user_id)
+    for path in root.glob("*.v*" if year is None else f"{year}.v*"):
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        root.rmdir()
+    except OSError:  # other years are left, or nothing was ever archived
+        pass
+
+
+def archived_years(user_id, since_year=None):
+    """``{year: columns}`` of the user's archived years, oldest first, with deleted categories masked out."""
+    with sharding.for_user(user_id):
+        years = ArchivedYear.objects.filter(user_id=user_id).order_by("year")
+        if since_year is not None:
+            years = years.filter(year__gte=since_year)
+        years = list(years.values_list("year", "version"))
+        if not years:
+            return {}
+        category_ids = np.fromiter(
+            Category.objects.filter(user_id=user_id).values_list("id", flat=True), dtype=np.int64
+        )
+    archived = {}
+    for year, version in years:
+        columns = read_year(year_path(user_id, year, version))
+        live = np.isin(columns["category_ids"], category_ids)
+        archived[year] = columns if live.all() else {name: column[live] for name, column in columns.items()}
+    return archived
+
+
+def total(user_id):
+    """Sum of the user's archived base amounts."""
+    return to_decimal(sum(int(columns["cents"].sum()) for columns in archived_years(user_id).values()))
+
+
+def year_totals(user_id, year):
+    """``{category_id: cents}`` for an archived year, or ``None`` when the year is not archived."""
+    columns = archived_years(user_id, since_year=year).get(year)
+    if columns is None:
+        return None
+    categories, inverse = np.unique(columns["category_ids"], return_inverse=True)
+    cents = np.bincount(inverse, weights=columns["cents"], minlength=categories.size)
+    # float64 sums of whole cents stay exact up to 2**53.
+    return dict(zip(categories.tolist(), cents.astype(np.int64).tolist()))
+
+
+def columns_since(user_id, since):
+    """Archived ``ids``, ``category_ids``, ``cents`` and ``created`` from ``since`` on, sorted by time."""
+    years = archived_years(user_id, since_year=since.year)
+    if not years:
+        return None
+    joined = {name: np.concatenate([columns[name] for columns in years.values()]) for name in COLUMNS}
+    start = np.searchsorted(
+        joined["created"], np.datetime64(since.astimezone(dt_timezone.utc).replace(tzinfo=None))
+    )
+    return {name: joined[name][start:] for name in ("ids", "category_ids", "cents", "created")}
+
+
+def _table_columns(rows):
+    ids, created, category_ids, base_amounts, amounts, currencies = zip(*rows)
+    count = len(ids)
+    return {
+        "ids": np.fromiter(ids, dtype=np.int64, count=count),
+        "created": np.fromiter(
+            ((value - EPOCH) // MICROSECOND for value in created), dtype=np.int64, count=count
+        ).astype("datetime64[us]"),
+        "category_ids": np.fromiter(category_ids, dtype=np.int64, count=count),
+        "cents": np.fromiter((int(amount * 100) for amount in base_amounts), dtype=np.int64, count=count),
+        "amount_cents": np.fromiter((int(amount * 100) for amount in amounts), dtype=np.int64, count=count),
+        "currencies": np.array(currencies, dtype="S3"),
+    }
+
+
+def _switch(user_id, year, columns, delete_pks=(), batch_size=1000):
+    """Write ``columns`` as the next version of the year and switch to it, deleting ``delete_pks`` from the table."""
+    with sharding.for_user(user_id) as alias:
+        record = ArchivedYear.objects.filter(user_id=user_id, year=year).first()
+        version = record.version + 1 if record else 1
+        write_year(year_path(user_id, year, version), columns)
+        # Moving rows to the archive is not deleting them: no tombstones, no history.
+        with transaction.atomic(using=alias), sharding.replicating():
+            ArchivedYear.objects.update_or_create(
+                user_id=user_id, year=year, defaults={"version": version, "count": columns["ids"].size}
+            )
+            for start in range(0, len(delete_pks), batch_size):
+                Expense.objects.filter(pk__in=delete_pks[start : start + batch_size]).delete()
+    remove_old_versions(user_id, year, version)
+
+
+def archive_year(user_id, year, batch_size=1000):
+    """Move the user's expenses of ``year`` into the archive; returns how many were moved.
+
+    Rows already archived by an interrupted run are replaced by their table copy.
+    """
+    start, end = year_bounds(year)
+    with sharding.for_user(user_id):
+        rows = list(
+            Expense.objects.filter(user_id=user_id, created_at__gte=start, created_at__lt=end)
+            .order_by("created_at", "pk")
+            .values_list("id", "created_at", "category_id", "base_amount", "amount", "currency")
+        )
+        if not rows:
+            return 0
+        record = ArchivedYear.objects.filter(user_id=user_id, year=year).first()
+    columns = _table_columns(rows)
+    if record is not None:
+        archived = read_year(year_path(user_id, year, record.version))
+        kept = ~np.isin(archived["ids"], columns["ids"])
+        columns = {name: np.concatenate([archived[name][kept], columns[name]]) for name in COLUMNS}
+        order = np.lexsort((columns["ids"], columns["created"]))
+        columns = {name: column[order] for name, column in columns.items()}
+    _switch(user_id, year, columns, [row[0] for row in rows], batch_size)
+    return len(rows)
+
+
+def reconvert(user_id=None, currency_code=None, since=None):
+    """Recompute archived base amounts like ``tasks.reconvert_expenses`` does for the table.
+
+    Works on the archived years of the current shard. Returns ``(changed, failed)``.
+    """
+    years = ArchivedYear.objects.order_by("user_id", "year")
+    if user_id:
+        years = years.filter(user_id=user_id)
+    if since:
+        years = years.filter(year__gte=since.year)
+    base_currencies = {}
+    changed = failed = 0
+    for archived_user_id, year, version in years.values_list("user_id", "year", "version"):
+        if archived_user_id not in base_currencies:
+            base_currencies[archived_user_id] = User.objects.get(pk=archived_user_id).base_currency
+        base_currency = base_currencies[archived_user_id]
+        columns = {
+            name: np.array(column)
+            for name, column in read_year(year_path(archived_user_id, year, version)).items()
+        }
+        selected = np.ones(columns["ids"].size, dtype=bool)
+        if currency_code:
+            selected &= columns["currencies"] == currency_code.upper().encode()
+        if since:
+            selected &= columns["created"] >= np.datetime64(since, "us")
+        year_changed = 0
+        for index in np.flatnonzero(selected):
+            try:
+                base_amount, _ = currency.convert(
+                    to_decimal(columns["amount_cents"][index]),
+                    columns["currencies"][index].decode(),
+                    base_currency,
+                    columns["created"][index].astype(datetime).date(),
+                )
+            except currency.CurrencyError:
+                failed += 1
+                continue
+            cents = int(base_amount * 100)
+            if cents != columns["cents"][index]:
+                columns["cents"][index] = cents
+                year_changed += 1
+        if year_changed:
+            _switch(archived_user_id, year, columns)
+            invalidate_forecast(archived_user_id)
+            live.publish_refresh(archived_user_id)
+            changed += year_changed
+    return changed, failed
@@ -0,0 +1,23 @@
+"""Cache keys and invalidation helpers shared by the expense read paths.
+
+Kept free of heavy imports so model signals can use them without pulling
+NumPy or the API stack into every process.
+"""
+
+from django.core.cache import cache
+
+
+def analytics_month_key(user_id, month):
+    return f"analytics:{user_id}:{month}"
+
+
+def invalidate_analytics_month(user_id, created_at):
+    cache.delete(analytics_month_key(user_id, created_at.strftime("%Y-%m")))
+
+
+def forecast_key(user_id):
+    return f"forecast:{user_id}"
+
+
+def invalidate_forecast(user_id):
+    cache.delete(forecast_key(user_id))
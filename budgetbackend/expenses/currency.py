@@ -0,0 +1,73 @@
+"""Exchange rates and conversion to a user's base currency.
+
+Rates are stored per day as units of a currency per one ``FX_PIVOT_CURRENCY``
+(the layout of the ECB reference rates), so any pair converts through the pivot.
+Each process keeps the rate series it has used in memory and reloads them when
+``import_fx_rates`` bumps the table version, which keeps conversion at write time
+free of extra queries.
+"""
+
+from bisect import bisect_right
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+RATES_VERSION_KEY = "fx:rates-version"
+CENT = Decimal("0.01")
+RATE_PRECISION = Decimal("0.00000001")
+
+# {currency: (dates, rates)} sorted by date, valid for _loaded_version
+_series = {}
+_loaded_version = None
+
+
+class CurrencyError(ValueError):
+    pass
+
+
+def bump_rates_version():
+    cache.set(RATES_VERSION_KEY, cache.get(RATES_VERSION_KEY, 0) + 1, None)
+
+
+def _rate_series(currency):
+    global _loaded_version
+
+    version = cache.get(RATES_VERSION_KEY, 0)
+    if version != _loaded_version:
+        _series.clear()
+        _loaded_version = version
+    if currency not in _series:
+        ExchangeRate = apps.get_model("expenses", "ExchangeRate")
+        rows = ExchangeRate.objects.filter(currency=currency).order_by("date").values_list("date", "rate")
+        _series[currency] = tuple(map(list, zip(*rows))) or ([], [])
+    return _series[currency]
+
+
+def pivot_rate(currency, on_date):
+    """Units of ``currency`` per one pivot unit on ``on_date`` (latest known rate on or before it)."""
+    if currency == settings.FX_PIVOT_CURRENCY:
+        return Decimal(1)
+    dates, rates = _rate_series(currency)
+    index = bisect_right(dates, on_date)
+    if not index:
+        raise CurrencyError(f"No exchange rate for {currency} on or before {on_date}")
+    return rates[index - 1]
+
+
+def rate(from_currency, to_currency, on_date):
+    """Units of ``to_currency`` per one unit of ``from_currency``."""
+    if from_currency == to_currency:
+        return Decimal(1)
+    return (pivot_rate(to_currency, on_date) / pivot_rate(from_currency, on_date)).quantize(RATE_PRECISION)
+
+
+def convert(amount, from_currency, to_currency, on_date):
+    """Return ``(converted_amount, rate)`` with the amount rounded to cents."""
+    exchange_rate = rate(from_currency, to_currency, on_date)
+    return (Decimal(amount) * exchange_rate).quantize(CENT, rounding=ROUND_HALF_UP), exchange_rate
+
+
+def is_supported(currency):
+    return currency == settings.FX_PIVOT_CURRENCY or bool(_rate_series(currency)[0])
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.db import router, transaction
+
+from . import tombstones
+from .fingerprint import fingerprint, nearby_fingerprints
+from .models import DuplicateCandidate, Expense
+
+
+def flag_duplicates(expense):
+    """Record older expenses ``expense`` looks like a repeat of; one lookup on the fingerprint index."""
+    earlier = list(
+        Expense.objects.filter(
+            user_id=expense.user_id,
+            fingerprint__in=nearby_fingerprints(
+                expense.user_id,
+                expense.amount,
+                expense.currency,
+                expense.description,
+                expense.created_at.date(),
+            ),
+        )
+        .exclude(pk=expense.pk)
+        .values_list("pk", flat=True)
+    )
+    DuplicateCandidate.objects.bulk_create(
+        [DuplicateCandidate(user_id=expense.user_id, expense=expense, duplicate_of_id=pk) for pk in earlier],
+        ignore_conflicts=True,
+    )
+    return earlier
+
+
+def scan(expenses, chunk_size=5000):
+    """Stream ``expenses`` in creation order and record every repeat against the first expense it repeats.
+
+    Repeats are found as in :func:`flag_duplicates`: same fingerprint on the same day or the
+    day before. Only the fingerprints of the current and previous day of one user are held,
+    rows are read with a server-side cursor and candidates written per chunk, so memory
+    stays flat however long the history is. Returns ``(scanned, repeats)``; pairs recorded
+    before, including dismissed ones, are left as they are.
+    """
+    rows = (
+        expenses.exclude(fingerprint="")
+        .order_by("user_id", "created_at", "pk")
+        .values_list("user_id", "pk", "fingerprint", "amount", "currency", "description", "created_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    scanned = repeats = 0
+    pending = []
+    user = day = None
+    # {fingerprint: pk of the first expense with it} for ``day`` and the day before
+    today, yesterday = {}, {}
+    for user_id, pk, day_print, amount, currency, description, created_at in rows:
+        scanned += 1
+        on_date = created_at.date()
+        if (user_id, on_date) != (user, day):
+            yesterday = today if user_id == user and on_date - day == timedelta(days=1) else {}
+            today = {}
+            user, day = user_id, on_date
+        first_pk = None
+        if yesterday:
+            first_pk = yesterday.get(
+                fingerprint(user_id, amount, currency, description, on_date - timedelta(days=1))
+            )
+        if first_pk is None:
+            first_pk = today.get(day_print)
+        today.setdefault(day_print, pk)
+        if first_pk is None:
+            continue
+        repeats += 1
+        pending.append(DuplicateCandidate(user_id=user_id, expense_id=pk, duplicate_of_id=first_pk))
+        if len(pending) >= chunk_size:
+            DuplicateCandidate.objects.bulk_create(pending, ignore_conflicts=True)
+            pending = []
+    DuplicateCandidate.objects.bulk_create(pending, ignore_conflicts=True)
+    return scanned, repeats
+
+
+def merge(candidate, keep_original=True):
+    """Delete one of the two expenses of ``candidate`` and return the one kept."""
+    keep, drop = candidate.duplicate_of, candidate.expense
+    if not keep_original:
+        keep, drop = drop, keep
+    with transaction.atomic(using=router.db_for_write(Expense, instance=drop)), tombstones.batched_deletes():
+        # Candidates involving the dropped expense go with it.
+        drop.delete()
+    return keep
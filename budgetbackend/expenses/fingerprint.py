@@ -0,0 +1,33 @@
+"""Normalized expense fingerprints for duplicate detection.
+
+Two expenses of one user get the same fingerprint when they have the same amount and
+currency, the same description up to case, punctuation and spacing, and were entered on
+the same day.
+"""
+
+import hashlib
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+WORD = re.compile(r"\w+")
+APOSTROPHES = re.compile(r"['\u2019]")
+CENT = Decimal("0.01")
+
+
+def normalize(text):
+    """Lower-case words separated by single spaces; "Joe's Café!" becomes "joes café"."""
+    return " ".join(WORD.findall(APOSTROPHES.sub("", text.lower())))
+
+
+def fingerprint(user_id, amount, currency, description, on_date):
+    key = f"{user_id}|{Decimal(amount).quantize(CENT)}|{currency}|{normalize(description)}|{on_date.isoformat()}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def nearby_fingerprints(user_id, amount, currency, description, on_date):
+    """Fingerprints for ``on_date`` and the day before, so entries either side of midnight still pair up."""
+    return [
+        fingerprint(user_id, amount, currency, description, day)
+        for day in (on_date, on_date - timedelta(days=1))
+    ]
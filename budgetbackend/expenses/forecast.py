@@ -0,0 +1,132 @@
+"""Cash-flow forecast over the monthly rollups.
+
+The history is the per-category monthly totals of ``analytics.monthly_statistics``, whose
+closed months come from the cache, so expenses are never re-scanned. Each category's
+series is smoothed exponentially (with a month-of-year pattern taken out first once there
+are ``FORECAST_SEASONAL_MIN_MONTHS`` closed months to estimate it from); all categories are
+fitted together as rows of one matrix. Every month's forecast is spread evenly over its
+days and subtracted from ``current_balance`` to find the day the balance reaches zero.
+
+Forecasts are computed for ``FORECAST_MAX_MONTHS`` and cached for the rest of the day, or
+until one of the user's expenses, categories or balance settings changes.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .analytics import month_window, monthly_statistics
+from .cache import forecast_key
+from .models import Category
+
+
+def monthly_series(user_id):
+    """Return ``(category_ids, months, cents)`` where ``cents[i, j]`` is spent in category ``i`` in month ``j``.
+
+    The last month is the current one, spent so far.
+    """
+    stats = monthly_statistics(user_id, month_window(settings.FORECAST_HISTORY_MONTHS))
+    pairs = [pair for month in stats for pair in month["by_category"]]
+    category_ids = np.array([category_id for category_id, _ in pairs], dtype=np.int64)
+    categories, inverse = np.unique(category_ids, return_inverse=True)
+    cents = np.zeros((categories.size, len(stats)))
+    month_index = np.repeat(np.arange(len(stats)), [len(month["by_category"]) for month in stats])
+    np.add.at(cents, (inverse, month_index), np.array([value for _, value in pairs], dtype=np.float64))
+    months = np.array([month["month"] for month in stats], dtype="datetime64[M]")
+    return categories, months, cents
+
+
+def fit(cents, months):
+    """Smoothed level and month-of-year offsets (``[:, 0]`` is January) for each row of ``cents``."""
+    count = months.size
+    month_of_year = months.astype(np.int64) % 12
+    seasonal = np.zeros((cents.shape[0], 12))
+    if count >= settings.FORECAST_SEASONAL_MIN_MONTHS:
+        # Every month of the year occurs at least twice.
+        occurrences = np.eye(12)[month_of_year]
+        deviations = cents - cents.mean(axis=1, keepdims=True)
+        seasonal = deviations @ occurrences / occurrences.sum(axis=0)
+    # Simple exponential smoothing started at the first month, written as one weighted sum:
+    # the last month weighs alpha, each month before it (1 - alpha) times less.
+    alpha = settings.FORECAST_SMOOTHING
+    weights = alpha * (1 - alpha) ** np.arange(count - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (count - 1)
+    return (cents - seasonal[:, month_of_year]) @ weights, seasonal
+
+
+def build_forecast(user):
+    today = np.datetime64(timezone.now().date(), "D")
+    categories, history, cents = monthly_series(user.pk)
+    spent = cents[:, -1]
+    closed, history = cents[:, :-1], history[:-1]
+    # Months before the first expense say nothing about spending.
+    active = np.flatnonzero(closed.any(axis=0))
+    if active.size:
+        level, seasonal = fit(closed[:, active[0] :], history[active[0] :])
+    else:
+        # No closed month yet: extrapolate the current one.
+        month = today.astype("datetime64[M]")
+        elapsed = (today - month.astype("datetime64[D]")).astype(np.int64) + 1
+        length = ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+        level, seasonal = spent * length / elapsed, np.zeros((categories.size, 12))
+
+    months = today.astype("datetime64[M]") + np.arange(settings.FORECAST_MAX_MONTHS + 1)
+    expected = np.maximum(level[:, None] + seasonal[:, months.astype(np.int64) % 12], 0)
+    # What is left to spend this month, from tomorrow on.
+    remaining = expected.copy()
+    remaining[:, 0] = np.maximum(expected[:, 0] - spent, 0)
+    expected[:, 0] = spent + remaining[:, 0]
+    starts = months.astype("datetime64[D]")
+    starts[0] = today + 1
+    days = ((months + 1).astype("datetime64[D]") - starts).astype(np.int64)
+    month_totals = remaining.sum(axis=0)
+    rates = np.divide(month_totals, days, out=np.zeros_like(month_totals), where=days > 0)
+
+    balance_cents = int(user.current_balance * 100)
+    dates = today + 1 + np.arange(days.sum())
+    balances = np.round(balance_cents - np.cumsum(np.repeat(rates, days)))
+    if balance_cents <= 0:
+        zero_date = str(today)
+    else:
+        below = np.flatnonzero(balances <= 0)
+        zero_date = str(dates[below[0]]) if below.size else None
+
+    names = dict(Category.objects.filter(id__in=categories.tolist()).values_list("id", "name"))
+    return {
+        "current_balance": balance_cents / 100,
+        "zero_date": zero_date,
+        "months": [
+            {
+                "month": str(month),
+                "total": round(float(expected[:, i].sum()) / 100, 2),
+                "by_category": [
+                    {
+                        "category_id": int(categories[c]),
+                        "category__name": names.get(int(categories[c])),
+                        "total": round(float(expected[c, i]) / 100, 2),
+                    }
+                    for c in np.argsort(-expected[:, i], kind="stable")
+                    if expected[c, i] >= 1
+                ],
+            }
+            for i, month in enumerate(months)
+        ],
+        "daily": [
+            {"date": str(date), "balance": balance / 100} for date, balance in zip(dates, balances.tolist())
+        ],
+    }
+
+
+def forecast(user, months):
+    """The forecast for the current month and the next ``months``, from the cache when possible."""
+    today = str(timezone.now().date())
+    key = forecast_key(user.pk)
+    cached = cache.get(key)
+    if cached is None or cached["day"] != today:
+        cached = {"day": today, "forecast": build_forecast(user)}
+        cache.set(key, cached, settings.FORECAST_CACHE_TIMEOUT)
+    result = cached["forecast"]
+    shown = result["months"][: months + 1]
+    last_month = shown[-1]["month"]
+    return dict(result, months=shown, daily=[day for day in result["daily"] if day["date"][:7] <= last_month])
@@ -0,0 +1,85 @@
+"""Change history for categories and expenses.
+
+Signal handlers write a :class:`ChangeRecord` per change in the transaction of the change
+itself, so a change and its record commit or roll back together; ``TrackedModel.save``
+opens one for saves, and deletes run in one already. Deletes of many rows at once, such
+as a category with its expenses, run inside :func:`batched`, which collects the records
+and writes them with one insert per database at the end of the block; run it inside the
+delete's transaction. ``ChangeHistoryMiddleware`` makes the request's user the actor.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, router
+
+from accounts.models import User
+from budgetbackend import sharding
+
+from .models import ChangeRecord
+
+_buffer = ContextVar("change_history_buffer", default=None)
+_request = ContextVar("change_history_request", default=None)
+
+
+def diff(instance, created):
+    before = {} if created else instance.loaded_values()
+    return {
+        name: [before.get(name), getattr(instance, name)]
+        for name in instance.history_fields
+        if created or (name in before and before[name] != getattr(instance, name))
+    }
+
+
+def current_actor():
+    # DRF copies the user it authenticated onto the underlying request.
+    user = getattr(_request.get(), "user", None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def _ensure_actor(actor, alias):
+    if actor is not None and alias != DEFAULT_DB_ALIAS:
+        # Staff changing other users' data: the actor's row must be on that shard too.
+        if not User.objects.using(alias).filter(pk=actor.pk).exists():
+            sharding.copy_row(User.objects.get(pk=actor.pk), alias)
+
+
+def record_change(instance, action, changes):
+    record = ChangeRecord(
+        user_id=instance.user_id,
+        actor=current_actor(),
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        action=action,
+        changes=changes,
+    )
+    alias = router.db_for_write(type(instance), instance=instance)
+    buffer = _buffer.get()
+    if buffer is None:
+        _ensure_actor(record.actor, alias)
+        record.save(using=alias)
+    else:
+        buffer.setdefault(alias, []).append(record)
+
+
+@contextmanager
+def batched():
+    buffer = {}
+    token = _buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+    for alias, records in buffer.items():
+        _ensure_actor(records[0].actor, alias)
+        ChangeRecord.objects.using(alias).bulk_create(records)
+
+
+@contextmanager
+def acting(request):
+    """Attribute the changes made inside the block to the user ``request`` authenticates."""
+    token = _request.set(request)
+    try:
+        yield
+    finally:
+        _request.reset(token)
@@ -0,0 +1,202 @@
+"""Server-sent events that keep a dashboard's balance and summaries current.
+
+``GET /api/live/`` opens a ``text/event-stream``. It starts with a ``snapshot`` event
+holding the profile (with ``current_balance``) and the month, quarter and year summaries,
+the same data as ``/api/auth/profile/`` and ``/api/summary/``. After that every committed
+change to one of the user's expenses arrives as a ``delta`` event:
+
+    {"expense": 12, "action": "updated", "balance": -4.5, "total": 4.5,
+     "by_category": [{"category__name": "Food", "total": 4.5}], "periods": ["month", "quarter", "year"]}
+
+``balance`` is added to ``current_balance``; ``total`` and ``by_category`` are added to
+the summary of every period listed. Changes that are not worth describing (a renamed or
+deleted category, a new base currency, a bulk recategorization) send a fresh snapshot
+instead. An idle stream costs a queue entry and a comment line every
+``LIVE_KEEPALIVE_INTERVAL`` seconds.
+
+Streams need the ASGI server (``budgetbackend.asgi``). Browsers' ``EventSource`` cannot
+send headers, so instead of the API token they may pass ``?stream_token=``, obtained from
+``POST /api/live/token/``. It opens streams only and expires after
+``LIVE_STREAM_TOKEN_MAX_AGE`` seconds, so one leaked through access logs is of little
+use; once a stream is refused, clients fetch a new one. Under WSGI the endpoint answers
+with a single snapshot and a ``retry`` delay, which ``EventSource`` turns into polling.
+With the ``local`` backend, changes of users with no open stream cost no queries.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from accounts.serializers import UserSerializer
+from budgetbackend import pubsub, sharding
+
+from .models import Category
+from .summary import PERIODS, current_summaries, period_start
+
+STREAM_TOKEN_SALT = "expenses.live.stream"
+
+
+def topic(user_id):
+    return f"user:{user_id}"
+
+
+def stream_token(user):
+    """A signed token that opens the user's streams for ``LIVE_STREAM_TOKEN_MAX_AGE`` seconds."""
+    return signing.dumps(user.pk, salt=STREAM_TOKEN_SALT)
+
+
+def _refresh(user_id):
+    if pubsub.has_subscribers(topic(user_id)):
+        pubsub.publish(topic(user_id), pubsub.REFRESH)
+
+
+def publish_refresh(user_id, using=None):
+    """Send the user's streams a new snapshot once the transaction on ``using`` (default: their shard) commits."""
+    transaction.on_commit(partial(_refresh, user_id), using=using or sharding.shard_for_user(user_id))
+
+
+def expense_delta(instance, action):
+    """The ``delta`` event for a saved or deleted expense, or ``None`` when its totals did not change."""
+    loaded = instance.loaded_values()
+    if action != "created" and "base_amount" not in loaded:
+        return pubsub.REFRESH  # saved without being loaded first; what it replaced is unknown
+    changes = defaultdict(Decimal)
+    if action != "created":
+        changes[loaded.get("category_id", instance.category_id)] -= loaded.get(
+            "base_amount", instance.base_amount
+        )
+    if action != "deleted":
+        changes[instance.category_id] += instance.base_amount
+    changes = {category_id: total for category_id, total in changes.items() if total}
+    if not changes:
+        return None
+
+    if list(changes) == [instance.category_id]:
+        names = {instance.category_id: instance.category.name}
+    else:
+        names = dict(Category.objects.filter(id__in=list(changes)).values_list("id", "name"))
+    created_at = timezone.localtime(instance.created_at)
+    now = timezone.localtime()
+    total = sum(changes.values())
+    return {
+        "type": "delta",
+        "expense": instance.pk,
+        "action": action,
+        "balance": -total,
+        "total": total,
+        "by_category": [
+            {"category__name": names.get(category_id), "total": change}
+            for category_id, change in changes.items()
+        ],
+        "periods": [
+            time_period
+            for time_period in PERIODS
+            if period_start(time_period, now).date() <= created_at.date() and created_at.year == now.year
+        ],
+    }
+
+
+def publish_expense_change(instance, action):
+    if not pubsub.has_subscribers(topic(instance.user_id)):
+        # A stream opened before the commit has read the old data; it gets a snapshot.
+        publish_refresh(instance.user_id, instance._state.db)
+        return
+    event = expense_delta(instance, action)
+    if event is not None:
+        transaction.on_commit(
+            partial(pubsub.publish, topic(instance.user_id), event), using=instance._state.db
+        )
+
+
+def _authenticate(request):
+    header = request.headers.get("Authorization", "").split()
+    if len(header) == 2 and header[0] == "Token":
+        return TokenAuthentication().authenticate_credentials(header[1])[0]
+    try:
+        user_id = signing.loads(
+            request.GET.get("stream_token", ""),
+            salt=STREAM_TOKEN_SALT,
+            max_age=settings.LIVE_STREAM_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        raise AuthenticationFailed("Invalid or expired stream token.")
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        raise AuthenticationFailed("User inactive or deleted.")
+    return user
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {JSONRenderer().render(data).decode()}\n\n"
+
+
+def _snapshot(user_id):
+    with sharding.for_user(user_id):
+        user = User.objects.get(pk=user_id)
+        return _event(
+            "snapshot",
+            {
+                "profile": UserSerializer(user).data,
+                "summaries": current_summaries(user, timezone.localtime().replace(tzinfo=None)),
+            },
+        )
+
+
+async def _events(user_id, subscription):
+    try:
+        yield f"retry: {settings.LIVE_RETRY_MS}\n\n"
+        yield await sync_to_async(_snapshot)(user_id)
+        # Clients reconnect, which re-authenticates them and bounds streams the server
+        # never noticed were closed.
+        deadline = time.monotonic() + settings.LIVE_STREAM_MAX_AGE
+        while time.monotonic() < deadline:
+            try:
+                message = await subscription.get(settings.LIVE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message["type"] == "delta":
+                yield _event("delta", message)
+            else:
+                yield await sync_to_async(_snapshot)(user_id)
+    finally:
+        pubsub.unsubscribe(subscription)
+
+
+async def stream(request):
+    if request.method != "GET":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except AuthenticationFailed as error:
+        return JsonResponse({"detail": str(error.detail)}, status=401)
+
+    if not isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            [f"retry: {settings.LIVE_RETRY_MS}\n\n", await sync_to_async(_snapshot)(user.pk)],
+            content_type="text/event-stream",
+        )
+    else:
+        if pubsub.subscriber_count(topic(user.pk)) >= settings.LIVE_MAX_STREAMS_PER_USER:
+            return JsonResponse({"detail": "Too many open streams."}, status=429)
+        # Subscribed before the snapshot is read, so no change falls in between.
+        response = StreamingHttpResponse(
+            _events(user.pk, pubsub.subscribe(topic(user.pk))), content_type="text/event-stream"
+        )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx would hold events back
+    return response
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budgetbackend import sharding
+from expenses import archive
+from expenses.models import Expense
+
+
+class Command(BaseCommand):
+    help = "Move the expenses of closed years out of the expense table into per-user columnar files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only this user id")
+        parser.add_argument(
+            "--before-year",
+            type=int,
+            help="Archive years before this one (default: the current year minus ARCHIVE_AFTER_YEARS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted at a time")
+
+    def handle(self, *args, **options):
+        before_year = options["before_year"] or timezone.now().year - settings.ARCHIVE_AFTER_YEARS
+        cutoff, _ = archive.year_bounds(before_year)
+
+        started = time.perf_counter()
+        moved = years = 0
+        for alias in sharding.shards():
+            expenses = Expense.objects.using(alias).filter(created_at__lt=cutoff)
+            if options["users"]:
+                expenses = expenses.filter(user_id__in=options["users"])
+            user_years = (
+                expenses.values_list("user_id", "created_at__year")
+                .distinct()
+                .order_by("user_id", "created_at__year")
+            )
+            for user_id, year in user_years:
+                if sharding.shard_for_user(user_id) != alias or sharding.placement(user_id)[1]:
+                    # Being moved, or copies left behind by a move; a later run picks the user up.
+                    self.stdout.write(
+                        self.style.WARNING(f"Skipped user {user_id} ({year}): moving between shards")
+                    )
+                    continue
+                count = archive.archive_year(user_id, year, options["batch_size"])
+                self.stdout.write(f"User {user_id}: archived {count} expenses of {year}")
+                moved += count
+                years += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved} expenses from {years} user years before {before_year} "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from budgetbackend import docs
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI document for the current CODE_VERSION so API workers never build it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write to this path instead of API_SCHEMA_DIR")
+
+    def handle(self, *args, **options):
+        path = Path(options["output"]) if options["output"] else docs.schema_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = docs.generate_schema()
+        path.write_bytes(body)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {len(body)} bytes for version {settings.CODE_VERSION} to {path}")
+        )
@@ -0,0 +1,70 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.currency import bump_rates_version
+from expenses.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load daily exchange rates (units of a currency per one FX_PIVOT_CURRENCY) from a CSV file, "
+        "either as date,currency,rate rows or in the ECB wide layout (Date,USD,JPY,...)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="") as f:
+            reader = csv.DictReader(f, skipinitialspace=True)
+            if not reader.fieldnames:
+                raise CommandError("The file is empty")
+            fields = {name.strip().lower(): name for name in reader.fieldnames if name}
+            if {"date", "currency", "rate"} <= fields.keys():
+                rows = ((row[fields["date"]], row[fields["currency"]], row[fields["rate"]]) for row in reader)
+            else:
+                date_field = reader.fieldnames[0]
+                rows = (
+                    (row[date_field], code, value)
+                    for row in reader
+                    for code, value in row.items()
+                    if code and code != date_field
+                )
+
+            batch, imported, skipped = [], 0, 0
+            for day, code, value in rows:
+                code = code.strip().upper()
+                try:
+                    rate = Decimal(value.strip())
+                except (AttributeError, InvalidOperation):
+                    # ECB files mark days without a fix as N/A.
+                    skipped += 1
+                    continue
+                if code == settings.FX_PIVOT_CURRENCY or rate <= 0:
+                    skipped += 1
+                    continue
+                batch.append(ExchangeRate(date=date.fromisoformat(day.strip()), currency=code, rate=rate))
+                if len(batch) >= options["batch_size"]:
+                    imported += self.save(batch)
+                    batch = []
+            imported += self.save(batch)
+
+        bump_rates_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} rates ({skipped} skipped). "
+                f"Run reconvert_expenses if rates for past days were corrected."
+            )
+        )
+
+    @staticmethod
+    def save(batch):
+        ExchangeRate.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=["currency", "date"], update_fields=["rate"]
+        )
+        return len(batch)
@@ -0,0 +1,174 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from accounts.models import User, UserShard
+from budgetbackend import sharding
+from expenses.models import (
+    ArchivedYear,
+    CategorizationRule,
+    Category,
+    ChangeRecord,
+    DuplicateCandidate,
+    Expense,
+    Tombstone,
+)
+
+# Parents before children, so foreign keys hold on the destination at every step.
+# Archive files are addressed by user and year only and stay where they are.
+MOVED_MODELS = [
+    Category,
+    CategorizationRule,
+    Expense,
+    DuplicateCandidate,
+    Tombstone,
+    ChangeRecord,
+    ArchivedYear,
+]
+
+
+class Command(BaseCommand):
+    help = "Move users' categories, expenses and related rows between shards"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Move this user id")
+        parser.add_argument("--to", help="Shard to move --user to")
+        parser.add_argument(
+            "--rehash",
+            action="store_true",
+            help="Move every user to the shard their id hashes to, e.g. after adding a shard",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows copied or deleted at a time")
+        parser.add_argument(
+            "--no-wait",
+            action="store_true",
+            help="Skip waiting for cached placements to expire (only safe with a shared cache)",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] and options["to"] not in sharding.shards():
+            raise CommandError(f"--to must be one of {', '.join(sharding.shards())}")
+        self.batch_size = options["batch_size"]
+        self.wait = 0 if options["no_wait"] else settings.SHARD_PLACEMENT_CACHE_TIMEOUT
+
+        # Finish moves an earlier run was interrupted in first.
+        moving = set(UserShard.objects.exclude(moving_to="").values_list("user_id", "moving_to"))
+        moves = dict(moving)
+        if options["users"]:
+            moves.update((user_id, options["to"]) for user_id in options["users"])
+        if options["rehash"]:
+            moves.update(self.misplaced_users())
+        moves = {
+            user_id: destination
+            for user_id, destination in moves.items()
+            if (user_id, destination) in moving or sharding.shard_for_user(user_id) != destination
+        }
+
+        if moves:
+            # Block the users' writes, then give processes holding cached placements time to notice.
+            for user_id, destination in moves.items():
+                self.set_placement(user_id, moving_to=destination)
+            self.settle()
+            for user_id, destination in moves.items():
+                self.copy_user(user_id, destination)
+
+        cleanups = list(UserShard.objects.exclude(cleanup_shard="").values_list("user_id", "cleanup_shard"))
+        if cleanups:
+            # Processes may still read from the old shard until their cached placement expires.
+            self.settle()
+        for user_id, source in cleanups:
+            self.clean_up(user_id, source)
+        self.stdout.write(self.style.SUCCESS(f"Moved {len(moves)} users"))
+
+    def misplaced_users(self):
+        placed = dict(UserShard.objects.values_list("user_id", "shard"))
+        for user_id in User.objects.order_by("pk").values_list("pk", flat=True).iterator():
+            destination = sharding.stable_shard(user_id)
+            if placed.get(user_id, DEFAULT_DB_ALIAS) != destination:
+                yield user_id, destination
+
+    def set_placement(self, user_id, **fields):
+        placement, _ = UserShard.objects.get_or_create(
+            user_id=user_id, defaults={"shard": sharding.shard_for_user(user_id)}
+        )
+        for name, value in fields.items():
+            setattr(placement, name, value)
+        placement.save()
+        sharding.invalidate_placement(user_id)
+
+    def settle(self):
+        if self.wait:
+            self.stdout.write(f"Waiting {self.wait}s for cached placements to expire")
+            time.sleep(self.wait)
+
+    def batches(self, queryset):
+        """Yield ``queryset`` in ascending primary-key batches."""
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by("pk")[: self.batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield batch
+
+    def copy_user(self, user_id, destination):
+        source = sharding.shard_for_user(user_id)
+        self.stdout.write(f"User {user_id}: copying {source} -> {destination}")
+        with sharding.replicating():
+            sharding.copy_row(User.objects.get(pk=user_id), destination)
+            actors = (
+                ChangeRecord.objects.using(source)
+                .filter(user_id=user_id, actor__isnull=False)
+                .exclude(actor_id=user_id)
+                .values_list("actor_id", flat=True)
+                .distinct()
+            )
+            for actor in User.objects.filter(pk__in=list(actors)):
+                sharding.copy_row(actor, destination)
+
+            for model in MOVED_MODELS:
+                # bulk_create stamps auto_now(_add) fields with the current time; bulk_update puts them back.
+                stamps = [
+                    field.attname
+                    for field in model._meta.concrete_fields
+                    if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+                ]
+                copied = 0
+                for batch in self.batches(model._base_manager.using(source).filter(user_id=user_id)):
+                    originals = [[getattr(row, name) for name in stamps] for row in batch]
+                    with transaction.atomic(using=destination):
+                        # Rows copied by an interrupted run are overwritten rather than duplicated.
+                        model._base_manager.using(destination).bulk_create(batch, ignore_conflicts=True)
+                        for row, values in zip(batch, originals):
+                            for name, value in zip(stamps, values):
+                                setattr(row, name, value)
+                        fields = [
+                            field.name
+                            for field in model._meta.concrete_fields
+                            if not field.primary_key and field.name != "user"
+                        ]
+                        model._base_manager.using(destination).bulk_update(batch, fields)
+                    copied += len(batch)
+                self.stdout.write(f"  {model._meta.verbose_name_plural}: {copied}")
+        if connections[destination].vendor == "sqlite":
+            sharding.reset_sequences(destination)
+
+        self.set_placement(user_id, shard=destination, moving_to="", cleanup_shard=source)
+
+    def clean_up(self, user_id, source):
+        self.stdout.write(f"User {user_id}: removing the copies left on {source}")
+        with sharding.replicating():
+            for model in reversed(MOVED_MODELS):
+                rows = model._base_manager.using(source).filter(user_id=user_id)
+                for batch in self.batches(rows.only("pk")):
+                    with transaction.atomic(using=source):
+                        model._base_manager.using(source).filter(pk__in=[row.pk for row in batch]).delete()
+            # The copy of the user row stays while other users' history on that shard names them as actor.
+            if (
+                source != DEFAULT_DB_ALIAS
+                and not ChangeRecord.objects.using(source).filter(actor_id=user_id).exists()
+            ):
+                User.objects.using(source).filter(pk=user_id).delete()
+        self.set_placement(user_id, cleanup_shard="")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from expenses.tasks import recategorize_expenses
+
+
+class Command(BaseCommand):
+    help = "Re-apply categorization rules to existing expenses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only this user id")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk")
+        if options["users"]:
+            users = users.filter(pk__in=options["users"])
+
+        started = time.perf_counter()
+        checked = moved = 0
+        for user in users.iterator():
+            user_checked, user_moved = recategorize_expenses(user, options["batch_size"])
+            checked += user_checked
+            moved += user_moved
+            if user_moved:
+                self.stdout.write(f"{user}: moved {user_moved} of {user_checked} expenses")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {checked} expenses and moved {moved} in {elapsed:.1f}s "
+                f"({checked / max(elapsed, 1e-9):.0f} per second)"
+            )
+        )
@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from budgetbackend import sharding
+from expenses import archive
+from expenses.tasks import expenses_to_reconvert, reconvert_expenses
+
+
+class Command(BaseCommand):
+    help = "Recompute base-currency amounts after exchange rates or a user's base currency changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only this user's expenses")
+        parser.add_argument("--currency", help="Only expenses entered in this currency")
+        parser.add_argument("--since", type=date.fromisoformat, help="Only expenses created on or after")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = failed = 0
+        for alias in sharding.shards():
+            with sharding.on_shard(alias):
+                expenses = expenses_to_reconvert(options["user"], options["currency"], options["since"])
+                shard_changed, shard_failed = reconvert_expenses(
+                    expenses,
+                    batch_size=options["batch_size"],
+                    progress=lambda done, total: self.stdout.write(f"{alias}: {done}/{total}", ending="\r"),
+                )
+                archived_changed, archived_failed = archive.reconvert(
+                    options["user"], options["currency"], options["since"]
+                )
+            changed += shard_changed + archived_changed
+            failed += shard_failed + archived_failed
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(f"Updated {changed} expenses"))
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(f"{failed} expenses have no exchange rate and were left as is")
+            )
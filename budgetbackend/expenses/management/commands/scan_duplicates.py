@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from budgetbackend import sharding
+from expenses import duplicates
+from expenses.models import DuplicateCandidate, Expense
+
+
+class Command(BaseCommand):
+    help = "Find likely duplicate expenses by fingerprint and queue them for review"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only this user id")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows fetched and written at a time")
+
+    def handle(self, *args, **options):
+        scanned = repeats = new = 0
+        for alias in sharding.shards():
+            with sharding.on_shard(alias):
+                expenses = Expense.objects.all()
+                if options["users"]:
+                    expenses = expenses.filter(user_id__in=options["users"])
+                before = DuplicateCandidate.objects.count()
+                shard_scanned, shard_repeats = duplicates.scan(expenses, options["chunk_size"])
+                new += DuplicateCandidate.objects.count() - before
+            scanned += shard_scanned
+            repeats += shard_repeats
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} expenses: {repeats} likely duplicates, {new} new for review"
+            )
+        )
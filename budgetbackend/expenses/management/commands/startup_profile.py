@@ -0,0 +1,92 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before it can serve its first request: configure settings,
+# populate the app registry, build the WSGI handler and load the URLconf.
+BOOT_SCRIPT = """
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print((time.perf_counter() - start) * 1000)
+"""
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold-start time and report the slowest imports (python -X importtime)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Number of timed cold starts")
+        parser.add_argument("--top", type=int, default=15, help="Number of packages and modules to list")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail when the median cold start exceeds settings.STARTUP_TIME_TARGET_MS",
+        )
+
+    def handle(self, *args, **options):
+        timings = [float(self.boot().stdout.strip().splitlines()[-1]) for _ in range(options["runs"])]
+        imports = self.parse_import_times(self.boot("-X", "importtime").stderr)
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in imports:
+            packages[name.split(".")[0]] += self_us
+        top_level = sorted(
+            ((name, cumulative_us) for name, _, cumulative_us, depth in imports if depth == 0),
+            key=lambda item: -item[1],
+        )
+
+        self.stdout.write("Slowest top-level packages (self time of all their modules):")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[: options["top"]]:
+            self.stdout.write(f"  {self_us / 1000:9.1f} ms  {name}")
+        self.stdout.write("Slowest top-level imports (cumulative):")
+        for name, cumulative_us in top_level[: options["top"]]:
+            self.stdout.write(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+        median = statistics.median(timings)
+        target = settings.STARTUP_TIME_TARGET_MS
+        self.stdout.write(
+            f"Cold start over {len(timings)} runs: median {median:.1f} ms, "
+            f"min {min(timings):.1f} ms, max {max(timings):.1f} ms (target {target} ms)"
+        )
+        if median > target:
+            message = f"Median cold start {median:.1f} ms exceeds the {target} ms target"
+            if options["check"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("Cold start is within target"))
+
+    def boot(self, *interpreter_options):
+        result = subprocess.run(
+            [sys.executable, *interpreter_options, "-c", BOOT_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Worker boot failed:\n{result.stderr[-2000:]}")
+        return result
+
+    @staticmethod
+    def parse_import_times(output):
+        """Return ``(module, self_us, cumulative_us, depth)`` for every line of ``-X importtime`` output."""
+        imports = []
+        for line in output.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                imports.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+        return imports
@@ -0,0 +1,12 @@
+from . import history
+
+
+class ChangeHistoryMiddleware:
+    """Record the user a request authenticates as the actor of the changes it makes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with history.acting(request):
+            return self.get_response(request)
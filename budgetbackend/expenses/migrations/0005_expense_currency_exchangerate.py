@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:59
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def fill_base_amounts(apps, schema_editor):
+    # Existing expenses were entered in their owner's base currency.
+    Expense = apps.get_model("expenses", "Expense")
+    User = apps.get_model("accounts", "User")
+    Expense.objects.update(
+        base_amount=F("amount"),
+        currency=Subquery(User.objects.filter(pk=OuterRef("user_id")).values("base_currency")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_user_base_currency"),
+        ("expenses", "0004_tombstone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="expense",
+            name="currency",
+            field=models.CharField(blank=True, max_length=3),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="base_amount",
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="exchange_rate",
+            field=models.DecimalField(decimal_places=8, default=1, editable=False, max_digits=18),
+        ),
+        migrations.RunPython(fill_base_amounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="expense",
+            name="base_amount",
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("currency", models.CharField(max_length=3)),
+                ("rate", models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                "unique_together": {("currency", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0005_expense_currency_exchangerate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["user", "updated_at"], name="expenses_ca_user_id_444cc9_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(fields=["user", "updated_at"], name="expenses_ex_user_id_9a1328_idx"),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from expenses.fingerprint import fingerprint
+
+
+def fill_fingerprints(apps, schema_editor):
+    Expense = apps.get_model("expenses", "Expense")
+    expenses = Expense.objects.order_by("pk").only(
+        "user_id", "amount", "currency", "description", "created_at"
+    )
+    last_pk = 0
+    while True:
+        batch = list(expenses.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for expense in batch:
+            expense.fingerprint = fingerprint(
+                expense.user_id,
+                expense.amount,
+                expense.currency,
+                expense.description,
+                expense.created_at.date(),
+            )
+        Expense.objects.bulk_update(batch, ["fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("expenses", "0008_categorizationrule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DuplicateCandidate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("dismissed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="fingerprint",
+            field=models.CharField(blank=True, default="", editable=False, max_length=32),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(fields=["user", "fingerprint"], name="expenses_ex_user_id_beb5c7_idx"),
+        ),
+        migrations.AddField(
+            model_name="duplicatecandidate",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="expenses.expense",
+            ),
+        ),
+        migrations.AddField(
+            model_name="duplicatecandidate",
+            name="expense",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="expenses.expense",
+            ),
+        ),
+        migrations.AddField(
+            model_name="duplicatecandidate",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="duplicate_candidates",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="duplicatecandidate",
+            index=models.Index(fields=["user", "dismissed_at"], name="expenses_du_user_id_13b023_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="duplicatecandidate",
+            unique_together={("expense", "duplicate_of")},
+        ),
+    ]
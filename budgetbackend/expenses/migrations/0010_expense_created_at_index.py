@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0009_expense_fingerprint_duplicatecandidate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(fields=["created_at"], name="expenses_ex_created_52941d_idx"),
+        ),
+    ]
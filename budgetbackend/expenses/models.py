@@ -1,10 +1,43 @@
 from _decimal import Decimal
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 
+from . import currency
+from .fingerprint import fingerprint
 
-class Category(models.Model):
+
+class TrackedModel(models.Model):
+    """Remembers the values a row was loaded with so saves can be diffed for the change history."""
+
+    history_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept as loaded; only turned into a dict when the row is actually saved.
+        instance._loaded_values = (field_names, values)
+        return instance
+
+    def loaded_values(self):
+        field_names, values = getattr(self, "_loaded_values", ((), ()))
+        return dict(zip(field_names, values))
+
+    def reset_loaded_values(self):
+        self._loaded_values = (self.history_fields, [getattr(self, name) for name in self.history_fields])
+
+    def save(self, *args, **kwargs):
+        # post_save writes the change history; one transaction keeps the row and its record together.
+        with transaction.atomic(using=kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+
+class Category(TrackedModel):
     name = models.CharField(max_length=100)
     user = models.ForeignKey(
         "accounts.User",
@@ -16,19 +49,27 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    history_fields = ("name",)
+
     class Meta:
         unique_together = ("name", "user")
         verbose_name_plural = "categories"
+        indexes = [models.Index(fields=["user", "updated_at"])]
 
     def __str__(self):
-        return f"{self.name} ({self.user.username})"
+        return f"{self.name} ({self.user.username if self.user_id else 'system'})"
 
 
-class Expense(models.Model):
+class Expense(TrackedModel):
     description = models.CharField(max_length=255)
     amount = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))]
     )
+    currency = models.CharField(max_length=3, blank=True)
+    # Amount in the user's base currency, converted when the expense is saved so that
+    # balances and summaries never touch exchange rates.
+    base_amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    exchange_rate = models.DecimalField(max_digits=18, decimal_places=8, default=1, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="expenses")
     user = models.ForeignKey(
         "accounts.User",
@@ -37,9 +78,20 @@ class Expense(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # See fingerprint.py; equal for likely duplicates.
+    fingerprint = models.CharField(max_length=32, blank=True, default="", editable=False)
+
+    history_fields = ("description", "amount", "currency", "base_amount", "category_id")
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Covers the max(updated_at)/count validators of conditional GETs and delta syncs.
+            models.Index(fields=["user", "updated_at"]),
+            models.Index(fields=["user", "fingerprint"]),
+            # Admin changelist ordering and date filter.
+            models.Index(fields=["created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.description} - {self.amount} ({self.created_at})"
@@ -48,6 +100,187 @@ class Expense(models.Model):
         if self.category.user != self.user:
             raise ValidationError("Category does not belong to this user")
 
+    def convert(self):
+        """Fill ``base_amount`` from ``amount`` at the rate of the expense's creation day."""
+        base_currency = self.user.base_currency
+        self.currency = self.currency or base_currency
+        on_date = (self.created_at or timezone.now()).date()
+        try:
+            self.base_amount, self.exchange_rate = currency.convert(
+                self.amount, self.currency, base_currency, on_date
+            )
+        except currency.CurrencyError as exc:
+            raise ValidationError({"currency": str(exc)})
+
     def save(self, *args, **kwargs):
+        self.convert()
+        self.fingerprint = fingerprint(
+            self.user_id,
+            self.amount,
+            self.currency,
+            self.description,
+            (self.created_at or timezone.now()).date(),
+        )
         self.full_clean()
         super().save(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Marks a deleted category or expense so delta syncs can tell clients to drop it."""
+
+    CATEGORY = "category"
+    EXPENSE = "expense"
+    MODEL_CHOICES = [(CATEGORY, "Category"), (EXPENSE, "Expense")]
+
+    user = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.CASCADE,
+        related_name="tombstones",
+        null=True,
+        blank=True,
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
+
+
+class ExchangeRate(models.Model):
+    """Daily rate as units of ``currency`` per one ``settings.FX_PIVOT_CURRENCY``."""
+
+    date = models.DateField()
+    currency = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        unique_together = ("currency", "date")
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
+
+
+class ChangeRecord(models.Model):
+    """One create, update or delete of a category or expense; rows are never changed afterwards.
+
+    ``changes`` maps each changed field to ``[before, after]``.
+    """
+
+    CATEGORY = "category"
+    EXPENSE = "expense"
+    MODEL_CHOICES = [(CATEGORY, "Category"), (EXPENSE, "Expense")]
+
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    ACTION_CHOICES = [(CREATE, "Create"), (UPDATE, "Update"), (DELETE, "Delete")]
+
+    user = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.CASCADE,
+        related_name="change_history",
+        null=True,
+        blank=True,
+    )
+    actor = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"]),
+            models.Index(fields=["user", "model", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id} at {self.changed_at}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Change records are append-only")
+        super().save(*args, **kwargs)
+
+
+class CategorizationRule(models.Model):
+    """Puts new expenses whose description and amount match into ``category``.
+
+    Rules without a user are system rules and apply to everyone; a system rule's category
+    is mapped to the user's own category of the same name. See ``rules.py``.
+    """
+
+    KEYWORD = "keyword"
+    REGEX = "regex"
+    MATCH_TYPE_CHOICES = [(KEYWORD, "Keyword"), (REGEX, "Regular expression")]
+
+    user = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.CASCADE,
+        related_name="categorization_rules",
+        null=True,
+        blank=True,
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="rules")
+    match_type = models.CharField(max_length=10, choices=MATCH_TYPE_CHOICES, default=KEYWORD)
+    # Empty to match on amount alone.
+    pattern = models.CharField(max_length=200, blank=True)
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    priority = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-priority", "id"]
+
+    def __str__(self):
+        return f"{self.match_type} {self.pattern!r} -> {self.category.name}"
+
+
+class DuplicateCandidate(models.Model):
+    """``expense`` looks like a repeat of the older ``duplicate_of``; open until merged or dismissed."""
+
+    user = models.ForeignKey("accounts.User", on_delete=models.CASCADE, related_name="duplicate_candidates")
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name="+")
+    duplicate_of = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    dismissed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("expense", "duplicate_of")
+        indexes = [models.Index(fields=["user", "dismissed_at"])]
+
+    def __str__(self):
+        return f"{self.expense_id} duplicates {self.duplicate_of_id}"
+
+
+class ArchivedYear(models.Model):
+    """A year of a user's expenses moved from the table into columnar files (see archive.py).
+
+    ``version`` names the current set of files; rewrites go to a new version and switch
+    to it in the same transaction that changes the table.
+    """
+
+    user = models.ForeignKey("accounts.User", on_delete=models.CASCADE, related_name="archived_years")
+    year = models.PositiveSmallIntegerField()
+    version = models.PositiveIntegerField(default=1)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "year")
+
+    def __str__(self):
+        return f"{self.year} of {self.user_id} ({self.count} expenses)"
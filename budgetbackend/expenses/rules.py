@@ -0,0 +1,159 @@
+"""Automatic categorization of expenses by user and system rules.
+
+All rules that apply to a user are compiled into one :class:`Matcher`, so categorizing
+an expense costs a handful of dictionary lookups and a single regular-expression call
+however many rules there are:
+
+* keyword rules match whole words, case-insensitively. Keywords are kept in a dict keyed
+  by their normalized words and looked up with every run of up to N words of the
+  description, N being the longest keyword.
+* regex rules are compiled into one RE2 set, so one search reports every regex rule
+  that matches anywhere in the description. RE2 runs in time linear in the description
+  whatever the pattern, so a user's pattern cannot stall categorization; in exchange
+  backreferences and lookarounds are not supported.
+* rules without a pattern match on the amount range alone.
+
+Precedence is the user's own rules before system rules, then higher ``priority``, then
+the older rule. Compiled matchers are kept per process and rebuilt when the rules
+version of the user (or of the system rules) changes.
+"""
+
+import logging
+import uuid
+from collections import OrderedDict, defaultdict
+
+import re2
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .fingerprint import WORD, normalize
+from .models import CategorizationRule, Category
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_RULES_VERSION_KEY = "rules:version:system"
+
+# {user_id: (versions, matcher)}, least recently used first
+_matchers = OrderedDict()
+
+
+def _options():
+    options = re2.Options()
+    options.case_sensitive = False
+    options.log_errors = False
+    return options
+
+
+def check_regex(pattern):
+    """Raise ``ValueError`` unless ``pattern`` is acceptable for a user's regex rule."""
+    if len(pattern) > settings.RULES_REGEX_MAX_LENGTH:
+        raise ValueError(f"Regular expressions are limited to {settings.RULES_REGEX_MAX_LENGTH} characters.")
+    try:
+        re2.compile(pattern, _options())
+    except re2.error as exc:
+        message = exc.args[0] if exc.args else "unsupported pattern"
+        if isinstance(message, bytes):
+            message = message.decode(errors="replace")
+        raise ValueError(f"Invalid regular expression: {message}")
+
+
+class Matcher:
+    def __init__(self, rules):
+        """``rules`` are ``(match_type, pattern, min_amount, max_amount, category_id)`` in precedence order."""
+        self.rules = rules
+        self.keywords = defaultdict(list)
+        self.amount_only = []
+        # RE2 set index -> rule index
+        self.regex_rules = []
+        regexes = re2.Set.SearchSet(_options())
+        for index, (match_type, pattern, *_) in enumerate(rules):
+            if not pattern:
+                self.amount_only.append(index)
+            elif match_type == CategorizationRule.KEYWORD:
+                self.keywords[normalize(pattern)].append(index)
+            else:
+                try:
+                    regexes.Add(pattern)
+                except re2.error:
+                    # Saved before rules were checked against RE2; it can never match.
+                    logger.warning("Skipping regex rule %r that RE2 cannot compile", pattern)
+                    continue
+                self.regex_rules.append(index)
+        self.max_words = max((key.count(" ") + 1 for key in self.keywords), default=0)
+        if self.regex_rules:
+            regexes.Compile()
+            self.regexes = regexes
+        else:
+            self.regexes = None
+
+    def amount_matches(self, index, amount):
+        _, _, min_amount, max_amount, _ = self.rules[index]
+        return (min_amount is None or amount >= min_amount) and (max_amount is None or amount <= max_amount)
+
+    def match(self, description, amount):
+        """Return the category id of the first matching rule, or ``None``."""
+        candidates = list(self.amount_only)
+        if self.max_words:
+            words = WORD.findall(description.lower())
+            for length in range(1, self.max_words + 1):
+                for start in range(len(words) - length + 1):
+                    candidates.extend(self.keywords.get(" ".join(words[start : start + length]), ()))
+        if self.regexes is not None:
+            candidates.extend(self.regex_rules[found] for found in self.regexes.Match(description) or ())
+
+        best = min((index for index in candidates if self.amount_matches(index, amount)), default=None)
+        return None if best is None else self.rules[best][4]
+
+
+def _version_key(user_id):
+    return f"rules:version:{user_id}"
+
+
+def bump_rules_version(user_id=None):
+    cache.set(SYSTEM_RULES_VERSION_KEY if user_id is None else _version_key(user_id), uuid.uuid4().hex, None)
+
+
+def compile_rules(user_id):
+    rules = (
+        CategorizationRule.objects.filter(Q(user_id=user_id) | Q(user__isnull=True))
+        .order_by(F("user").asc(nulls_last=True), "-priority", "id")
+        .values_list("match_type", "pattern", "min_amount", "max_amount", "category_id")
+    )
+    return Matcher(list(rules))
+
+
+def matcher_for(user_id):
+    keys = [_version_key(user_id), SYSTEM_RULES_VERSION_KEY]
+    versions = cache.get_many(keys)
+    versions = tuple(versions.get(key) for key in keys)
+    cached = _matchers.get(user_id)
+    if cached is not None and cached[0] == versions:
+        _matchers.move_to_end(user_id)
+        return cached[1]
+
+    matcher = compile_rules(user_id)
+    _matchers[user_id] = (versions, matcher)
+    while len(_matchers) > settings.RULES_MATCHER_CACHE_SIZE:
+        _matchers.popitem(last=False)
+    return matcher
+
+
+def resolve_category(user, category_id, resolved=None):
+    """Return the user's category for a rule target, copying system categories on first use."""
+    if resolved is not None and category_id in resolved:
+        return resolved[category_id]
+    category = Category.objects.get(pk=category_id)
+    if category.user_id is None:
+        category, _ = Category.objects.get_or_create(user=user, name=category.name)
+    if resolved is not None:
+        resolved[category_id] = category
+    return category
+
+
+def categorize(user, description, amount):
+    """Return the category the user's rules assign to a new expense, or ``None``."""
+    category_id = matcher_for(user.pk).match(description, amount)
+    if category_id is None:
+        return None
+    return resolve_category(user, category_id)
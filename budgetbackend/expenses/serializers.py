@@ -1,6 +1,11 @@
+import re
+
+from django.db.models import Q
 from rest_framework import serializers
 
-from .models import Category, Expense
+from . import currency
+from .models import CategorizationRule, Category, ChangeRecord, DuplicateCandidate, Expense
+from .rules import check_regex
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,11 +17,121 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class ExpenseSerializer(serializers.ModelSerializer):
     category_id = serializers.PrimaryKeyRelatedField(
-        queryset=Category.objects.all(), source="category", write_only=True
+        queryset=Category.objects.all(),
+        source="category",
+        write_only=True,
+        required=False,
+        help_text="Leave out to let the categorization rules choose",
+    )
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    base_amount = serializers.DecimalField(
+        max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True
     )
+
+    class Meta:
+        model = Expense
+        fields = ("id", "description", "amount", "currency", "base_amount", "exchange_rate", "category_id")
+        read_only_fields = ("id", "base_amount", "exchange_rate", "created_at", "updated_at")
+        extra_kwargs = {"currency": {"required": False}}
+
+    def validate_currency(self, value):
+        value = value.upper()
+        # Amounts in the user's base currency, or in the one already stored, need no rates.
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated and value == request.user.base_currency:
+            return value
+        if self.instance is not None and value == self.instance.currency:
+            return value
+        if value and not currency.is_supported(value):
+            raise serializers.ValidationError(f"No exchange rates are available for {value}.")
+        return value
+
+
+class SyncCategorySerializer(serializers.ModelSerializer):
+    is_system = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Category
+        fields = ("id", "name", "is_system", "updated_at")
+
+    def get_is_system(self, obj):
+        return obj.user_id is None
+
+
+class SyncExpenseSerializer(serializers.ModelSerializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    base_amount = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False)
 
     class Meta:
         model = Expense
-        fields = ("id", "description", "amount", "category_id")
-        read_only_fields = ("id", "created_at", "updated_at")
+        fields = (
+            "id",
+            "description",
+            "amount",
+            "currency",
+            "base_amount",
+            "category_id",
+            "created_at",
+            "updated_at",
+        )
+
+
+class ChangeRecordSerializer(serializers.ModelSerializer):
+    actor = serializers.StringRelatedField()
+
+    class Meta:
+        model = ChangeRecord
+        fields = ("id", "model", "object_id", "action", "changes", "actor", "changed_at")
+
+
+class CategorizationRuleSerializer(serializers.ModelSerializer):
+    category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.none(), source="category")
+
+    class Meta:
+        model = CategorizationRule
+        fields = ("id", "category_id", "match_type", "pattern", "min_amount", "max_amount", "priority")
+        read_only_fields = ("id",)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated:
+            fields["category_id"].queryset = Category.objects.filter(
+                Q(user=request.user) | Q(user__isnull=True)
+            )
+        return fields
+
+    def validate(self, attrs):
+        match_type = attrs.get("match_type", getattr(self.instance, "match_type", CategorizationRule.KEYWORD))
+        pattern = attrs.get("pattern", getattr(self.instance, "pattern", ""))
+        min_amount = attrs.get("min_amount", getattr(self.instance, "min_amount", None))
+        max_amount = attrs.get("max_amount", getattr(self.instance, "max_amount", None))
+        if not pattern and min_amount is None and max_amount is None:
+            raise serializers.ValidationError("A rule needs a pattern or an amount range.")
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise serializers.ValidationError({"max_amount": "Must not be below min_amount."})
+        if match_type == CategorizationRule.KEYWORD and pattern and not re.search(r"\w", pattern):
+            raise serializers.ValidationError({"pattern": "Keywords must contain a letter or digit."})
+        if match_type == CategorizationRule.REGEX and pattern:
+            try:
+                check_regex(pattern)
+            except ValueError as exc:
+                raise serializers.ValidationError({"pattern": str(exc)})
+        return attrs
+
+
+class DuplicateCandidateSerializer(serializers.ModelSerializer):
+    expense = SyncExpenseSerializer()
+    duplicate_of = SyncExpenseSerializer()
+
+    class Meta:
+        model = DuplicateCandidate
+        fields = ("id", "expense", "duplicate_of", "created_at")
+
+
+class DuplicateMergeSerializer(serializers.Serializer):
+    keep = serializers.ChoiceField(
+        choices=["original", "duplicate"],
+        default="original",
+        help_text="Which expense to keep; the other one is deleted",
+    )
@@ -0,0 +1,119 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from budgetbackend.sharding import is_replicating
+
+from . import history, live, rules, tombstones
+from .cache import invalidate_analytics_month, invalidate_forecast
+from .models import ArchivedYear, CategorizationRule, Category, ChangeRecord, Expense
+
+
+@receiver([post_save, post_delete], sender=Expense)
+def invalidate_expense_analytics(sender, instance, **kwargs):
+    invalidate_analytics_month(instance.user_id, instance.created_at)
+    invalidate_forecast(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=User)
+def invalidate_user_forecast(sender, instance, **kwargs):
+    # Category names and the user's balance settings are part of the forecast.
+    user_id = instance.pk if sender is User else instance.user_id
+    if user_id is not None:
+        invalidate_forecast(user_id)
+
+
+def deleted_with_user(origin):
+    return isinstance(origin, User) or getattr(origin, "model", None) is User
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Expense)
+def record_tombstone(sender, instance, using, origin=None, **kwargs):
+    # Rows removed together with their user have nobody left to sync them, and copies removed
+    # while moving a user between shards were not deleted at all.
+    if deleted_with_user(origin) or is_replicating():
+        return
+    tombstones.record(instance, using)
+
+
+def deleted_with_category(origin):
+    return isinstance(origin, Category) or getattr(origin, "model", None) is Category
+
+
+# The live receivers come before record_save_history, which forgets the loaded values they diff.
+@receiver(post_save, sender=Expense)
+def publish_expense_save(sender, instance, created, raw=False, **kwargs):
+    if raw or is_replicating():
+        return
+    live.publish_expense_change(instance, "created" if created else "updated")
+
+
+@receiver(post_delete, sender=Expense)
+def publish_expense_delete(sender, instance, origin=None, **kwargs):
+    # The category's own delete sends one snapshot for all of them.
+    if deleted_with_user(origin) or deleted_with_category(origin) or is_replicating():
+        return
+    live.publish_expense_change(instance, "deleted")
+
+
+@receiver(post_save, sender=Category)
+def publish_category_rename(sender, instance, created, raw=False, **kwargs):
+    if raw or created or instance.user_id is None or is_replicating():
+        return
+    if instance.loaded_values().get("name") != instance.name:
+        live.publish_refresh(instance.user_id, instance._state.db)
+
+
+@receiver(post_delete, sender=Category)
+def publish_category_delete(sender, instance, origin=None, **kwargs):
+    if instance.user_id is None or deleted_with_user(origin) or is_replicating():
+        return
+    live.publish_refresh(instance.user_id, instance._state.db)
+
+
+@receiver(post_save, sender=User)
+def publish_user_change(sender, instance, created, using, update_fields=None, **kwargs):
+    # initial_balance and base_currency feed the balance and the summaries.
+    if created or is_replicating() or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    live.publish_refresh(instance.pk, using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Expense)
+def record_save_history(sender, instance, created, raw=False, **kwargs):
+    if raw or is_replicating():
+        return
+    changes = history.diff(instance, created)
+    if changes:
+        history.record_change(instance, ChangeRecord.CREATE if created else ChangeRecord.UPDATE, changes)
+    instance.reset_loaded_values()
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Expense)
+def record_delete_history(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin) or is_replicating():
+        return
+    changes = {name: [getattr(instance, name), None] for name in instance.history_fields}
+    history.record_change(instance, ChangeRecord.DELETE, changes)
+
+
+@receiver([post_save, post_delete], sender=CategorizationRule)
+def invalidate_rules(sender, instance, **kwargs):
+    rules.bump_rules_version(instance.user_id)
+
+
+@receiver(post_delete, sender=ArchivedYear)
+def remove_archive_files(sender, instance, using, **kwargs):
+    # The row moves with its user between shards; the files stay where they are.
+    if is_replicating():
+        return
+    from . import archive  # NumPy is only needed once there are archives.
+
+    transaction.on_commit(partial(archive.remove_files, instance.user_id, instance.year), using=using)
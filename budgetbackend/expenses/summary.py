@@ -0,0 +1,106 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import ArchivedYear, Category, Expense
+
+PERIODS = ("month", "quarter", "year")
+
+
+def period_start(time_period, now):
+    if time_period == "month":
+        return now.replace(day=1)
+    if time_period == "quarter":
+        return now.replace(month=3 * ((now.month - 1) // 3) + 1, day=1)
+    if time_period == "year":
+        return now.replace(month=1, day=1)
+    return None
+
+
+def filter_period(expenses, time_period, now):
+    if time_period == "month":
+        return expenses.filter(created_at__year=now.year, created_at__month=now.month)
+    if time_period == "quarter":
+        start_month = period_start("quarter", now).month
+        return expenses.filter(
+            created_at__year=now.year,
+            created_at__month__gte=start_month,
+            created_at__month__lt=start_month + 3,
+        )
+    if time_period == "year":
+        return expenses.filter(created_at__year=now.year)
+    return expenses
+
+
+def summarize(user, time_period, now):
+    expenses = filter_period(Expense.objects.filter(user=user), time_period, now)
+    total = expenses.aggregate(total=Sum("base_amount"))["total"] or 0
+    by_category = expenses.values("category__name").annotate(total=Sum("base_amount")).order_by("-total")
+    return {
+        "total": total,
+        "by_category": by_category,
+        "period": time_period,
+        "period_start": period_start(time_period, now),
+    }
+
+
+def year_summary(user, year):
+    """Summary of a calendar year, reading its archive files when the year was archived."""
+    totals = defaultdict(Decimal)
+    rows = (
+        Expense.objects.filter(user=user, created_at__year=year)
+        .values("category_id")
+        .annotate(total=Sum("base_amount"))
+        .values_list("category_id", "total")
+    )
+    for category_id, total in rows:
+        totals[category_id] += total
+    if ArchivedYear.objects.filter(user=user, year=year).exists():
+        from . import archive  # NumPy is only needed for archived years.
+
+        for category_id, cents in archive.year_totals(user.pk, year).items():
+            totals[category_id] += archive.to_decimal(cents)
+
+    names = dict(Category.objects.filter(id__in=list(totals)).values_list("id", "name"))
+    return {
+        "total": sum(totals.values()) or 0,
+        "by_category": [
+            {"category__name": names[category_id], "total": total}
+            for category_id, total in sorted(totals.items(), key=lambda item: -item[1])
+        ],
+        "period": "year",
+        "period_start": datetime(year, 1, 1),
+    }
+
+
+def current_summaries(user, now):
+    """Month, quarter and year summaries from a single grouped query over the current year."""
+    rows = (
+        Expense.objects.filter(user=user, created_at__year=now.year)
+        .values("created_at__month", "category__name")
+        .annotate(total=Sum("base_amount"))
+    )
+    quarter_start = period_start("quarter", now).month
+    totals = {time_period: defaultdict(int) for time_period in PERIODS}
+    for row in rows:
+        month = row["created_at__month"]
+        totals["year"][row["category__name"]] += row["total"]
+        if quarter_start <= month < quarter_start + 3:
+            totals["quarter"][row["category__name"]] += row["total"]
+        if month == now.month:
+            totals["month"][row["category__name"]] += row["total"]
+
+    return {
+        time_period: {
+            "total": sum(by_category.values()),
+            "by_category": [
+                {"category__name": name, "total": total}
+                for name, total in sorted(by_category.items(), key=lambda item: -item[1])
+            ],
+            "period": time_period,
+            "period_start": period_start(time_period, now),
+        }
+        for time_period, by_category in totals.items()
+    }
@@ -0,0 +1,207 @@
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from budgetbackend import sharding
+from jobs.models import Job
+from jobs.queue import enqueue, task
+
+from . import currency, live, rules
+from .cache import analytics_month_key, invalidate_forecast
+from .models import ChangeRecord, Expense
+
+
+@task("expenses.rebuild_analytics", concurrency=4)
+def rebuild_analytics(job, user_id, months=None):
+    """Recompute and cache a user's closed-month statistics."""
+    from .analytics import month_window, monthly_statistics
+
+    window = month_window(months or settings.ANALYTICS_MAX_MONTHS)
+    cache.delete_many([analytics_month_key(user_id, month) for month in window])
+    with sharding.for_user(user_id):
+        stats = monthly_statistics(user_id, window)
+    return {"months": len(stats), "expenses": sum(month["count"] for month in stats)}
+
+
+def schedule_analytics_rebuild(user):
+    """Recompute the user's rollups in the background after many of them were dropped at once."""
+    if not Job.objects.filter(task="expenses.rebuild_analytics", user=user, status=Job.QUEUED).exists():
+        enqueue("expenses.rebuild_analytics", user=user, payload={"user_id": user.pk}, priority=-1)
+
+
+def expenses_to_reconvert(user_id=None, currency_code=None, since=None):
+    expenses = Expense.objects.all()
+    if user_id:
+        expenses = expenses.filter(user_id=user_id)
+    if currency_code:
+        expenses = expenses.filter(currency=currency_code.upper())
+    if since:
+        expenses = expenses.filter(created_at__date__gte=since)
+    return expenses
+
+
+def reconvert_expenses(expenses, batch_size=1000, progress=None):
+    """Recompute ``base_amount`` in primary-key batches with one bulk update per batch.
+
+    Returns ``(changed, failed)`` where ``failed`` counts expenses without a usable rate.
+    """
+    expenses = (
+        expenses.select_related("user")
+        .only(
+            "id",
+            "user",
+            "amount",
+            "currency",
+            "base_amount",
+            "exchange_rate",
+            "created_at",
+            "user__base_currency",
+        )
+        .order_by("pk")
+    )
+    total = expenses.count()
+    done = changed = failed = 0
+    last_pk = 0
+    touched_users = {}
+    while True:
+        batch = list(expenses.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        now = timezone.now()
+        updated = []
+        for expense in batch:
+            try:
+                converted = currency.convert(
+                    expense.amount, expense.currency, expense.user.base_currency, expense.created_at.date()
+                )
+            except currency.CurrencyError:
+                failed += 1
+                continue
+            if converted != (expense.base_amount, expense.exchange_rate):
+                expense.base_amount, expense.exchange_rate = converted
+                expense.updated_at = now
+                updated.append(expense)
+        Expense.objects.bulk_update(updated, ["base_amount", "exchange_rate", "updated_at"])
+        cache.delete_many(
+            {
+                analytics_month_key(expense.user_id, expense.created_at.strftime("%Y-%m"))
+                for expense in updated
+            }
+        )
+        touched_users.update((expense.user_id, expense.user) for expense in updated)
+        changed += len(updated)
+        done += len(batch)
+        if progress:
+            progress(done, total)
+    for user_id, user in touched_users.items():
+        invalidate_forecast(user_id)
+        live.publish_refresh(user_id, expenses.db)
+        schedule_analytics_rebuild(user)
+    return changed, failed
+
+
+@task("expenses.reconvert", concurrency=1)
+def reconvert(job, user_id=None, currency_code=None, since=None):
+    from . import archive
+
+    changed = failed = 0
+    for alias in sharding.shards():
+        with sharding.on_shard(alias):
+            shard_changed, shard_failed = reconvert_expenses(
+                expenses_to_reconvert(user_id, currency_code, since and date.fromisoformat(since)),
+                progress=lambda done, total: job.set_progress(done * 100 / total),
+            )
+            archived_changed, archived_failed = archive.reconvert(
+                user_id, currency_code, since and date.fromisoformat(since)
+            )
+        changed += shard_changed + archived_changed
+        failed += shard_failed + archived_failed
+    return {"changed": changed, "failed": failed}
+
+
+def recategorize_expenses(user, batch_size=5000, progress=None, expenses=None):
+    """Re-apply the user's categorization rules to their expenses (or those of them in ``expenses``).
+
+    Expenses are read as plain tuples in primary-key batches and moved with one UPDATE per
+    target category and batch. Returns ``(checked, moved)``; unmatched expenses are left alone.
+    """
+    with sharding.for_user(user.pk) as alias:
+        matcher = rules.matcher_for(user.pk)
+        resolved = {}
+        expenses = (
+            (Expense.objects.all() if expenses is None else expenses)
+            .filter(user=user)
+            .order_by("pk")
+            .values_list("pk", "description", "amount", "category_id", "created_at")
+        )
+        total = expenses.count()
+        checked = moved = 0
+        last_pk = 0
+        while True:
+            batch = list(expenses.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            moves = defaultdict(list)
+            for pk, description, amount, category_id, created_at in batch:
+                target_id = matcher.match(description, amount)
+                if target_id is None:
+                    continue
+                category = rules.resolve_category(user, target_id, resolved)
+                if category.pk != category_id:
+                    moves[category.pk].append((pk, category_id, created_at))
+
+            now = timezone.now()
+            with transaction.atomic(using=alias):
+                for category_id, rows in moves.items():
+                    Expense.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+                        category_id=category_id, updated_at=now
+                    )
+                ChangeRecord.objects.bulk_create(
+                    ChangeRecord(
+                        user=user,
+                        model=ChangeRecord.EXPENSE,
+                        object_id=pk,
+                        action=ChangeRecord.UPDATE,
+                        changes={"category_id": [old_category_id, category_id]},
+                        changed_at=now,
+                    )
+                    for category_id, rows in moves.items()
+                    for pk, old_category_id, _ in rows
+                )
+            cache.delete_many(
+                {
+                    analytics_month_key(user.pk, created_at.strftime("%Y-%m"))
+                    for rows in moves.values()
+                    for _, _, created_at in rows
+                }
+            )
+            checked += len(batch)
+            moved += sum(map(len, moves.values()))
+            if progress:
+                progress(checked, total)
+            if len(batch) < batch_size:
+                # Last batch; an admin job's chunk of ids is read in a single query.
+                break
+        if moved:
+            invalidate_forecast(user.pk)
+            live.publish_refresh(user.pk, alias)
+            schedule_analytics_rebuild(user)
+        return checked, moved
+
+
+@task("expenses.recategorize", concurrency=2)
+def recategorize(job, user_id, expense_ids=None):
+    """Re-apply the user's rules to all their expenses, or to those in ``expense_ids``."""
+    checked, moved = recategorize_expenses(
+        User.objects.get(pk=user_id),
+        progress=lambda done, total: job.set_progress(done * 100 / total),
+        expenses=None if expense_ids is None else Expense.objects.filter(pk__in=expense_ids),
+    )
+    return {"checked": checked, "moved": moved}
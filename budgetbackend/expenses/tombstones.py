@@ -0,0 +1,44 @@
+"""Sync tombstones for deleted categories and expenses.
+
+``record_tombstone`` (a ``post_delete`` handler) marks every deleted row. Deletes of many
+rows at once, such as a category with its expenses, run inside :func:`batched`, which
+collects the tombstones and writes them with one insert per database at the end of the
+block; run it inside the delete's transaction so both commit together.
+:func:`batched_deletes` batches the deletes' change history as well.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import history
+from .models import Tombstone
+
+_buffer = ContextVar("tombstone_buffer", default=None)
+
+
+def record(instance, using):
+    tombstone = Tombstone(user_id=instance.user_id, model=instance._meta.model_name, object_id=instance.pk)
+    buffer = _buffer.get()
+    # Tombstones of reference rows are saved one by one so they are copied to every shard.
+    if buffer is None or tombstone.user_id is None:
+        tombstone.save()
+    else:
+        buffer.setdefault(using, []).append(tombstone)
+
+
+@contextmanager
+def batched():
+    buffer = {}
+    token = _buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+    for alias, tombstones in buffer.items():
+        Tombstone.objects.using(alias).bulk_create(tombstones)
+
+
+@contextmanager
+def batched_deletes():
+    with batched(), history.batched():
+        yield
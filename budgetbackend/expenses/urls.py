@@ -1,11 +1,23 @@
 from django.urls import path
 
+from . import live
 from .views import (
+    CategorizationRuleListCreateView,
+    CategorizationRuleRetrieveUpdateDestroyView,
     CategoryListCreateView,
     CategoryRetrieveUpdateDestroyView,
+    ChangeHistoryView,
+    DuplicateCandidateListView,
+    DuplicateDismissView,
+    DuplicateMergeView,
+    ExpenseAnalyticsView,
+    ExpenseForecastView,
     ExpenseListCreateView,
     ExpenseRetrieveUpdateDestroyView,
     ExpenseSummaryView,
+    LiveTokenView,
+    RecategorizeView,
+    SyncView,
 )
 
 urlpatterns = [
@@ -14,4 +26,16 @@ urlpatterns = [
     path("expenses/", ExpenseListCreateView.as_view(), name="expense-list"),
     path("expenses/<int:pk>/", ExpenseRetrieveUpdateDestroyView.as_view(), name="expense-detail"),
     path("summary/", ExpenseSummaryView.as_view(), name="expense-summary"),
+    path("live/", live.stream, name="live-updates"),
+    path("live/token/", LiveTokenView.as_view(), name="live-token"),
+    path("analytics/", ExpenseAnalyticsView.as_view(), name="expense-analytics"),
+    path("forecast/", ExpenseForecastView.as_view(), name="expense-forecast"),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("history/", ChangeHistoryView.as_view(), name="change-history"),
+    path("rules/", CategorizationRuleListCreateView.as_view(), name="rule-list"),
+    path("rules/<int:pk>/", CategorizationRuleRetrieveUpdateDestroyView.as_view(), name="rule-detail"),
+    path("rules/recategorize/", RecategorizeView.as_view(), name="rule-recategorize"),
+    path("duplicates/", DuplicateCandidateListView.as_view(), name="duplicate-list"),
+    path("duplicates/<int:pk>/merge/", DuplicateMergeView.as_view(), name="duplicate-merge"),
+    path("duplicates/<int:pk>/dismiss/", DuplicateDismissView.as_view(), name="duplicate-dismiss"),
 ]
@@ -1,20 +1,51 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from django.db.models import Q, Sum
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
-from rest_framework import filters, generics
+from drf_yasg.utils import no_body, swagger_auto_schema
+from rest_framework import filters, generics, status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Category, Expense
-from .serializers import CategorySerializer, ExpenseSerializer
-
-
-class CategoryListCreateView(generics.ListCreateAPIView):
+from accounts.idempotency import IdempotentCreateMixin, idempotency_key_parameter
+from accounts.serializers import UserSerializer
+from budgetbackend.conditional import ConditionalGetMixin
+from jobs.queue import enqueue
+from jobs.serializers import JobSerializer
+
+from . import duplicates, live, rules, tombstones
+from .models import (
+    ArchivedYear,
+    CategorizationRule,
+    Category,
+    ChangeRecord,
+    DuplicateCandidate,
+    Expense,
+    Tombstone,
+)
+from .serializers import (
+    CategorizationRuleSerializer,
+    CategorySerializer,
+    ChangeRecordSerializer,
+    DuplicateCandidateSerializer,
+    DuplicateMergeSerializer,
+    ExpenseSerializer,
+    SyncCategorySerializer,
+    SyncExpenseSerializer,
+)
+from .summary import current_summaries, summarize, year_summary
+
+
+class CategoryListCreateView(IdempotentCreateMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -25,6 +56,9 @@ class CategoryListCreateView(generics.ListCreateAPIView):
             return Category.objects.none()  # Return empty queryset for docs
         return Category.objects.filter(Q(user=self.request.user) | Q(user__isnull=True))
 
+    def get_validator_querysets(self):
+        return [self.get_queryset()]
+
     def perform_create(self, serializer):
         # Check if creating from system category
         system_category_id = self.request.data.get("system_category_id")
@@ -55,6 +89,7 @@ class CategoryListCreateView(generics.ListCreateAPIView):
         tags=["Categories"],
         operation_description="Create a new category",
         request_body=CategorySerializer,
+        manual_parameters=[idempotency_key_parameter],
         responses={201: CategorySerializer, 400: "Invalid input data", 401: "Unauthorized"},
     )
     def post(self, request, *args, **kwargs):
@@ -114,8 +149,14 @@ class CategoryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        # The category's expenses go with it; their tombstones and history are batched.
+        using = router.db_for_write(Category, instance=instance)
+        with transaction.atomic(using=using), tombstones.batched_deletes():
+            instance.delete()
+
 
-class ExpenseListCreateView(generics.ListCreateAPIView):
+class ExpenseListCreateView(IdempotentCreateMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -125,12 +166,16 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
     }
     search_fields = ["description"]
     ordering_fields = ["amount", "created_at"]
+    throttle_rates = {"write": "60/min"}
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Expense.objects.none()
         return Expense.objects.filter(user=self.request.user)
 
+    def get_validator_querysets(self):
+        return [self.get_queryset()]
+
     @swagger_auto_schema(
         tags=["Expenses"], operation_description="Retrieve a list of all expenses with filtering options"
     )
@@ -141,13 +186,29 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
         tags=["Expenses"],
         operation_description="Create a new expense record",
         request_body=ExpenseSerializer,
+        manual_parameters=[idempotency_key_parameter],
         responses={201: ExpenseSerializer, 400: "Invalid input data"},
     )
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        category = serializer.validated_data.get("category")
+        if category is None:
+            category = rules.categorize(
+                self.request.user,
+                serializer.validated_data["description"],
+                serializer.validated_data["amount"],
+            )
+            if category is None:
+                raise ValidationError({"category_id": ["No categorization rule matches; choose a category."]})
+        serializer.save(user=self.request.user, category=category)
+        self.possible_duplicates = duplicates.flag_duplicates(serializer.instance)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data["possible_duplicates"] = self.possible_duplicates
+        return response
 
 
 class ExpenseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
@@ -194,8 +255,20 @@ class ExpenseRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class ExpenseSummaryView(APIView):
+class ExpenseSummaryView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_rates = {"read": "120/min"}
+
+    def get_validator_querysets(self):
+        return [
+            Expense.objects.filter(user=self.request.user),
+            Category.objects.filter(user=self.request.user),
+            ArchivedYear.objects.filter(user=self.request.user),
+        ]
+
+    def get_validator_extras(self):
+        # Periods are relative to today.
+        return [datetime.now().date()]
 
     @swagger_auto_schema(
         tags=["Expenses"],
@@ -208,7 +281,13 @@ class ExpenseSummaryView(APIView):
                 type=openapi.TYPE_STRING,
                 enum=["month", "quarter", "year"],
                 default="month",
-            )
+            ),
+            openapi.Parameter(
+                "year",
+                openapi.IN_QUERY,
+                description="Summarize this calendar year instead, archived or not (overrides period)",
+                type=openapi.TYPE_INTEGER,
+            ),
         ],
         responses={
             200: openapi.Response(
@@ -231,41 +310,514 @@ class ExpenseSummaryView(APIView):
                         "period_start": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
                     },
                 ),
-            )
+            ),
+            400: "Invalid year",
         },
     )
     def get(self, request):
+        if "year" in request.query_params:
+            try:
+                year = int(request.query_params["year"])
+            except ValueError:
+                raise ValidationError({"year": "A valid integer is required."})
+            if not 1 <= year <= datetime.now().year:
+                raise ValidationError({"year": "Must not be in the future."})
+            return Response(year_summary(request.user, year))
         time_period = request.query_params.get("period", "month")
-        now = datetime.now()
-
-        expenses = Expense.objects.filter(user=request.user)
-
-        if time_period == "month":
-            expenses = expenses.filter(created_at__year=now.year, created_at__month=now.month)
-            date_from = now.replace(day=1)
-        elif time_period == "quarter":
-            current_quarter = (now.month - 1) // 3 + 1
-            start_month = 3 * (current_quarter - 1) + 1
-            date_from = now.replace(month=start_month, day=1)
-            expenses = expenses.filter(
-                created_at__year=now.year,
-                created_at__month__gte=start_month,
-                created_at__month__lt=start_month + 3,
+        return Response(summarize(request.user, time_period, datetime.now()))
+
+
+class ExpenseAnalyticsView(ConditionalGetMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_rates = {"read": "30/min"}
+
+    def get_validator_querysets(self):
+        return [
+            Expense.objects.filter(user=self.request.user),
+            Category.objects.filter(user=self.request.user),
+            ArchivedYear.objects.filter(user=self.request.user),
+        ]
+
+    def get_validator_extras(self):
+        return [datetime.now().date()]
+
+    @swagger_auto_schema(
+        tags=["Expenses"],
+        operation_description="Get spending statistics, growth, category shares and unusual expenses per month",
+        manual_parameters=[
+            openapi.Parameter(
+                "months",
+                openapi.IN_QUERY,
+                description=f"Number of months to analyse, including the current one "
+                f"(1-{settings.ANALYTICS_MAX_MONTHS})",
+                type=openapi.TYPE_INTEGER,
+                default=12,
             )
-        elif time_period == "year":
-            expenses = expenses.filter(created_at__year=now.year)
-            date_from = now.replace(month=1, day=1)
+        ],
+        responses={
+            200: openapi.Response(
+                description="Spending analytics report",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "months": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "month": openapi.Schema(type=openapi.TYPE_STRING),
+                                    "count": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "average": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "median": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "percentiles": openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        additional_properties=openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    ),
+                                    "growth": openapi.Schema(
+                                        type=openapi.TYPE_NUMBER,
+                                        description="Month-over-month change of the total, in percent",
+                                    ),
+                                    "anomalies": openapi.Schema(
+                                        type=openapi.TYPE_ARRAY,
+                                        items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                                        description="IDs of unusually large expenses",
+                                    ),
+                                },
+                            ),
+                        ),
+                        "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                        "count": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "average": openapi.Schema(type=openapi.TYPE_NUMBER),
+                        "by_category": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "category_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    "category__name": openapi.Schema(type=openapi.TYPE_STRING),
+                                    "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "share": openapi.Schema(
+                                        type=openapi.TYPE_NUMBER, description="Share of the total, in percent"
+                                    ),
+                                },
+                            ),
+                        ),
+                        "period_start": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                    },
+                ),
+            ),
+            400: "Invalid number of months",
+        },
+    )
+    def get(self, request):
+        try:
+            months = int(request.query_params.get("months", 12))
+        except ValueError:
+            raise ValidationError({"months": "A valid integer is required."})
+        if not 1 <= months <= settings.ANALYTICS_MAX_MONTHS:
+            raise ValidationError({"months": f"Must be between 1 and {settings.ANALYTICS_MAX_MONTHS}."})
+
+        # Imported here so NumPy is only loaded by workers that actually serve analytics.
+        from .analytics import build_report
+
+        return Response(build_report(request.user, months))
+
+
+class ExpenseForecastView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Expenses"],
+        operation_description="Forecast monthly spending per category and the daily balance, "
+        "including the day the balance would reach zero",
+        manual_parameters=[
+            openapi.Parameter(
+                "months",
+                openapi.IN_QUERY,
+                description=f"Number of months to forecast after the current one "
+                f"(1-{settings.FORECAST_MAX_MONTHS})",
+                type=openapi.TYPE_INTEGER,
+                default=3,
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="Cash-flow forecast",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "current_balance": openapi.Schema(type=openapi.TYPE_NUMBER),
+                        "zero_date": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            format=openapi.FORMAT_DATE,
+                            description=f"First day the balance is forecast to be at or below zero, "
+                            f"looking {settings.FORECAST_MAX_MONTHS} months ahead; null if it stays above",
+                        ),
+                        "months": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            description="The current month, in full, then the months forecast",
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "month": openapi.Schema(type=openapi.TYPE_STRING),
+                                    "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "by_category": openapi.Schema(
+                                        type=openapi.TYPE_ARRAY,
+                                        items=openapi.Schema(
+                                            type=openapi.TYPE_OBJECT,
+                                            properties={
+                                                "category_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                                "category__name": openapi.Schema(type=openapi.TYPE_STRING),
+                                                "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                            },
+                                        ),
+                                    ),
+                                },
+                            ),
+                        ),
+                        "daily": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            description="Forecast balance at the end of every day from tomorrow on",
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "date": openapi.Schema(
+                                        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE
+                                    ),
+                                    "balance": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                },
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            400: "Invalid number of months",
+        },
+    )
+    def get(self, request):
+        try:
+            months = int(request.query_params.get("months", 3))
+        except ValueError:
+            raise ValidationError({"months": "A valid integer is required."})
+        if not 1 <= months <= settings.FORECAST_MAX_MONTHS:
+            raise ValidationError({"months": f"Must be between 1 and {settings.FORECAST_MAX_MONTHS}."})
+
+        # Imported here so NumPy is only loaded by workers that actually serve forecasts.
+        from .forecast import forecast
+
+        return Response(forecast(request.user, months))
+
+
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Sync"],
+        operation_description="Get the user, categories, expenses and current summaries in one response. "
+        "Pass the previous `watermark` as `since` to receive only rows changed or deleted after it. "
+        "Rows changed shortly before it may be sent again.",
+        manual_parameters=[
+            openapi.Parameter(
+                "since",
+                openapi.IN_QUERY,
+                description="Watermark returned by the previous sync (ISO 8601). Omit for a full sync.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATETIME,
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="User data snapshot or delta",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "user": openapi.Schema(type=openapi.TYPE_OBJECT),
+                        "categories": openapi.Schema(
+                            type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)
+                        ),
+                        "expenses": openapi.Schema(
+                            type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)
+                        ),
+                        "deleted": openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "categories": openapi.Schema(
+                                    type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)
+                                ),
+                                "expenses": openapi.Schema(
+                                    type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)
+                                ),
+                            },
+                        ),
+                        "summary": openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            description="Expense summaries for the current month, quarter and year",
+                        ),
+                        "watermark": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                        "full": openapi.Schema(
+                            type=openapi.TYPE_BOOLEAN,
+                            description="True when the client must replace its local data instead of merging",
+                        ),
+                    },
+                ),
+            ),
+            400: "Invalid since watermark",
+            401: "Unauthorized",
+        },
+    )
+    def get(self, request):
+        user = request.user
+        # Rows are stamped when they are saved, not when their transaction commits, so a write
+        # in flight now can become visible later with an older updated_at. Handing out a
+        # watermark from before the read, less a margin, makes the next sync pick such rows up
+        # (clients merge the few rows they receive twice).
+        watermark = timezone.now() - timedelta(seconds=settings.SYNC_WATERMARK_MARGIN)
+
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                raise ValidationError({"since": "A valid ISO 8601 datetime is required."})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        # Tombstones older than the retention window are purged, so older clients resync from scratch.
+        full = not since or since < watermark - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+        categories = Category.objects.filter(Q(user=user) | Q(user__isnull=True))
+        expenses = Expense.objects.filter(user=user)
+        deleted = {"categories": [], "expenses": []}
+        if full:
+            expenses = expenses[: settings.SYNC_RECENT_EXPENSES]
         else:
-            date_from = None
+            categories = categories.filter(updated_at__gte=since)
+            expenses = expenses.filter(updated_at__gte=since)
+            tombstones = Tombstone.objects.filter(
+                Q(user=user) | Q(user__isnull=True), deleted_at__gte=since
+            ).values_list("model", "object_id")
+            for model, object_id in tombstones:
+                deleted["categories" if model == Tombstone.CATEGORY else "expenses"].append(object_id)
+
+        return Response(
+            {
+                "user": UserSerializer(user).data,
+                "categories": SyncCategorySerializer(categories, many=True).data,
+                "expenses": SyncExpenseSerializer(expenses, many=True).data,
+                "deleted": deleted,
+                "summary": current_summaries(user, datetime.now()),
+                "watermark": watermark,
+                "full": full,
+            }
+        )
+
+
+class HistoryPagination(CursorPagination):
+    # Keyset pagination on the primary key: each page is an index range scan, however deep.
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class ChangeHistoryView(generics.ListAPIView):
+    serializer_class = ChangeRecordSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = HistoryPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["model", "object_id", "action"]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return ChangeRecord.objects.none()
+        return ChangeRecord.objects.filter(user=self.request.user).select_related("actor")
+
+    @swagger_auto_schema(
+        tags=["History"],
+        operation_description=(
+            "List changes to your categories and expenses, newest first. "
+            "Filter by model and object_id for the history of one object; follow `next` for older changes."
+        ),
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class CategorizationRuleListCreateView(generics.ListCreateAPIView):
+    serializer_class = CategorizationRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return CategorizationRule.objects.none()
+        return CategorizationRule.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @swagger_auto_schema(
+        tags=["Rules"],
+        operation_description="List your categorization rules in the order they are tried",
+        responses={200: CategorizationRuleSerializer(many=True), 401: "Unauthorized"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Rules"],
+        operation_description=(
+            "Create a categorization rule. Keyword rules match whole words, regex rules match anywhere "
+            "in the description (case-insensitive); either may be limited to an amount range. "
+            "New expenses sent without a category_id get the category of the first matching rule."
+        ),
+        request_body=CategorizationRuleSerializer,
+        responses={201: CategorizationRuleSerializer, 400: "Invalid input data", 401: "Unauthorized"},
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class CategorizationRuleRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = CategorizationRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return CategorizationRule.objects.none()
+        return CategorizationRule.objects.filter(user=self.request.user)
 
-        total = expenses.aggregate(total=Sum("amount"))["total"] or 0
-        by_category = expenses.values("category__name").annotate(total=Sum("amount")).order_by("-total")
+    @swagger_auto_schema(tags=["Rules"], operation_description="Get a categorization rule")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Rules"],
+        operation_description="Update a categorization rule",
+        request_body=CategorizationRuleSerializer,
+    )
+    def put(self, request, *args, **kwargs):
+        return super().put(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Rules"],
+        operation_description="Partially update a categorization rule",
+        request_body=CategorizationRuleSerializer,
+    )
+    def patch(self, request, *args, **kwargs):
+        return super().patch(request, *args, **kwargs)
+
+    @swagger_auto_schema(tags=["Rules"], operation_description="Delete a categorization rule")
+    def delete(self, request, *args, **kwargs):
+        return super().delete(request, *args, **kwargs)
+
+
+class RecategorizeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Rules"],
+        operation_description=(
+            "Re-apply the categorization rules to all of your expenses in the background. "
+            "Expenses no rule matches keep their category. Poll the returned job for progress."
+        ),
+        request_body=no_body,
+        responses={202: JobSerializer, 401: "Unauthorized"},
+    )
+    def post(self, request):
+        job = enqueue("expenses.recategorize", user=request.user, payload={"user_id": request.user.pk})
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+
+class LiveTokenView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Expenses"],
+        operation_description=(
+            "Get a short-lived token for `GET /api/live/?stream_token=...`, for clients such as "
+            "browsers' EventSource that cannot send the Authorization header. It only opens "
+            "streams and expires after `expires_in` seconds."
+        ),
+        request_body=no_body,
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "stream_token": openapi.Schema(type=openapi.TYPE_STRING),
+                    "expires_in": openapi.Schema(type=openapi.TYPE_INTEGER),
+                },
+            ),
+            401: "Unauthorized",
+        },
+    )
+    def post(self, request):
         return Response(
             {
-                "total": total,
-                "by_category": by_category,
-                "period": time_period,
-                "period_start": date_from,
+                "stream_token": live.stream_token(request.user),
+                "expires_in": settings.LIVE_STREAM_TOKEN_MAX_AGE,
             }
         )
+
+
+class DuplicateCandidateListView(generics.ListAPIView):
+    serializer_class = DuplicateCandidateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return DuplicateCandidate.objects.none()
+        return (
+            DuplicateCandidate.objects.filter(user=self.request.user, dismissed_at__isnull=True)
+            .select_related("expense", "duplicate_of")
+            .order_by("-id")
+        )
+
+    @swagger_auto_schema(
+        tags=["Duplicates"],
+        operation_description="List likely duplicate expenses waiting for review, newest first",
+        responses={200: DuplicateCandidateSerializer(many=True), 401: "Unauthorized"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class DuplicateMergeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Duplicates"],
+        operation_description="Resolve a duplicate by deleting one of the two expenses",
+        request_body=DuplicateMergeSerializer,
+        responses={200: SyncExpenseSerializer, 401: "Unauthorized", 404: "Candidate not found"},
+    )
+    def post(self, request, pk):
+        candidate = get_object_or_404(
+            DuplicateCandidate.objects.select_related("expense", "duplicate_of"),
+            pk=pk,
+            user=request.user,
+            dismissed_at__isnull=True,
+        )
+        serializer = DuplicateMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kept = duplicates.merge(candidate, keep_original=serializer.validated_data["keep"] == "original")
+        return Response(SyncExpenseSerializer(kept).data)
+
+
+class DuplicateDismissView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Duplicates"],
+        operation_description="Mark two expenses as not duplicates; they are not suggested again",
+        request_body=no_body,
+        responses={204: "Dismissed", 401: "Unauthorized", 404: "Candidate not found"},
+    )
+    def post(self, request, pk):
+        dismissed = DuplicateCandidate.objects.filter(
+            pk=pk, user=request.user, dismissed_at__isnull=True
+        ).update(dismissed_at=timezone.now())
+        if not dismissed:
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import models
+
+
+class Household(models.Model):
+    name = models.CharField(max_length=100)
+    # Combined summaries convert each member's aggregates into this currency.
+    currency = models.CharField(max_length=3, default=settings.DEFAULT_CURRENCY)
+    members = models.ManyToManyField(
+        "accounts.User", through="HouseholdMembership", related_name="households"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class HouseholdMembership(models.Model):
+    OWNER = "owner"
+    MEMBER = "member"
+    ROLE_CHOICES = [(OWNER, "Owner"), (MEMBER, "Member")]
+
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.CASCADE,
+        related_name="household_memberships",
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=MEMBER)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("household", "user")
+
+    def __str__(self):
+        return f"{self.user_id} in {self.household_id} ({self.role})"
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .models import HouseholdMembership
+
+
+def _roles_key(household_id):
+    return f"household:{household_id}:roles"
+
+
+def membership_roles(household_id):
+    """Return ``{user_id: role}`` for a household.
+
+    Roles are cached only briefly: membership changes clear the cache, but with a per-process
+    cache the other processes only notice once their copy expires.
+    """
+    key = _roles_key(household_id)
+    roles = cache.get(key)
+    if roles is None:
+        roles = dict(
+            HouseholdMembership.objects.filter(household_id=household_id).values_list("user_id", "role")
+        )
+        cache.set(key, roles, settings.HOUSEHOLD_ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_membership_roles(household_id):
+    cache.delete(_roles_key(household_id))
+
+
+class IsHouseholdMember(BasePermission):
+    """Members may read a household; only owners may change it."""
+
+    def has_permission(self, request, view):
+        roles = membership_roles(view.kwargs["pk"])
+        # Views reuse the roles instead of querying memberships again.
+        view.household_roles = roles
+        role = roles.get(request.user.pk)
+        if role is None:
+            return False
+        return request.method in SAFE_METHODS or role == HouseholdMembership.OWNER
@@ -0,0 +1,28 @@
+from rest_framework import serializers
+
+from accounts.models import User
+from expenses import currency
+
+from .models import Household, HouseholdMembership
+
+
+class HouseholdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Household
+        fields = ("id", "name", "currency", "created_at")
+        read_only_fields = ("id", "created_at")
+
+    def validate_currency(self, value):
+        value = value.upper()
+        if not currency.is_supported(value):
+            raise serializers.ValidationError(f"No exchange rates are available for {value}.")
+        return value
+
+
+class HouseholdMembershipSerializer(serializers.ModelSerializer):
+    username = serializers.SlugRelatedField(source="user", slug_field="username", queryset=User.objects.all())
+
+    class Meta:
+        model = HouseholdMembership
+        fields = ("user_id", "username", "role", "joined_at")
+        read_only_fields = ("user_id", "joined_at")
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import HouseholdMembership
+from .permissions import invalidate_membership_roles
+
+
+@receiver([post_save, post_delete], sender=HouseholdMembership)
+def invalidate_household_roles(sender, instance, **kwargs):
+    invalidate_membership_roles(instance.household_id)
@@ -0,0 +1,85 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db.models import Sum
+
+from accounts.models import User
+from budgetbackend import sharding
+from expenses import currency
+from expenses.models import ArchivedYear, Expense
+from expenses.summary import filter_period, period_start
+
+
+def household_summary(household, member_ids, time_period, now):
+    """Combined totals and balances for ``member_ids``.
+
+    Expenses are aggregated per member and category in one grouped query and balances
+    in a second one, on each shard holding any of the members. Only these per-member
+    aggregates are converted into the household currency, never individual expenses.
+    """
+    members = {
+        member["id"]: member
+        for member in User.objects.filter(pk__in=member_ids).values(
+            "id", "username", "base_currency", "initial_balance"
+        )
+    }
+    spent = {}
+    rows = []
+    # Members may live on different shards; each shard aggregates its own members.
+    for alias, user_ids in sharding.group_by_shard(members).items():
+        expenses = Expense.objects.using(alias).filter(user_id__in=user_ids)
+        spent.update(
+            expenses.values("user_id").annotate(spent=Sum("base_amount")).values_list("user_id", "spent")
+        )
+        archived = set(
+            ArchivedYear.objects.using(alias).filter(user_id__in=user_ids).values_list("user_id", flat=True)
+        )
+        if archived:
+            from expenses import archive  # NumPy is only needed for archived years.
+
+            for user_id in archived:
+                spent[user_id] = spent.get(user_id, 0) + archive.total(user_id)
+        rows.extend(
+            filter_period(expenses, time_period, now)
+            .values("user_id", "category__name")
+            .annotate(total=Sum("base_amount"))
+        )
+
+    today = date.today()
+    rates = {
+        code: currency.rate(code, household.currency, today)
+        for code in {member["base_currency"] for member in members.values()}
+    }
+
+    by_category = defaultdict(int)
+    member_totals = defaultdict(int)
+    for row in rows:
+        total = row["total"] * rates[members[row["user_id"]]["base_currency"]]
+        by_category[row["category__name"]] += total
+        member_totals[row["user_id"]] += total
+
+    member_data = []
+    for member_id, member in members.items():
+        exchange_rate = rates[member["base_currency"]]
+        member_data.append(
+            {
+                "user_id": member_id,
+                "username": member["username"],
+                "total": round(member_totals[member_id], 2),
+                "balance": round((member["initial_balance"] - spent.get(member_id, 0)) * exchange_rate, 2),
+            }
+        )
+
+    return {
+        "household": household.pk,
+        "currency": household.currency,
+        "total": round(sum(member_totals.values()), 2),
+        "balance": sum(member["balance"] for member in member_data),
+        "by_category": [
+            {"category__name": name, "total": round(total, 2)}
+            for name, total in sorted(by_category.items(), key=lambda item: -item[1])
+        ],
+        "members": sorted(member_data, key=lambda member: member["username"]),
+        "period": time_period,
+        "period_start": period_start(time_period, now),
+    }
@@ -0,0 +1,21 @@
+from django.urls import path
+
+from .views import (
+    HouseholdListCreateView,
+    HouseholdMemberDestroyView,
+    HouseholdMemberListCreateView,
+    HouseholdRetrieveUpdateDestroyView,
+    HouseholdSummaryView,
+)
+
+urlpatterns = [
+    path("", HouseholdListCreateView.as_view(), name="household-list"),
+    path("<int:pk>/", HouseholdRetrieveUpdateDestroyView.as_view(), name="household-detail"),
+    path("<int:pk>/members/", HouseholdMemberListCreateView.as_view(), name="household-member-list"),
+    path(
+        "<int:pk>/members/<int:user_id>/",
+        HouseholdMemberDestroyView.as_view(),
+        name="household-member-detail",
+    ),
+    path("<int:pk>/summary/", HouseholdSummaryView.as_view(), name="household-summary"),
+]
@@ -0,0 +1,225 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.http import Http404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from expenses import currency
+
+from .models import Household, HouseholdMembership
+from .permissions import IsHouseholdMember
+from .serializers import HouseholdMembershipSerializer, HouseholdSerializer
+from .summary import household_summary
+
+
+class HouseholdListCreateView(generics.ListCreateAPIView):
+    serializer_class = HouseholdSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Household.objects.none()
+        return Household.objects.filter(memberships__user=self.request.user)
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        household = serializer.save()
+        HouseholdMembership.objects.create(
+            household=household, user=self.request.user, role=HouseholdMembership.OWNER
+        )
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="List the households the current user belongs to",
+        responses={200: HouseholdSerializer(many=True), 401: "Unauthorized"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Create a household owned by the current user",
+        request_body=HouseholdSerializer,
+        responses={201: HouseholdSerializer, 400: "Invalid input data", 401: "Unauthorized"},
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class HouseholdRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = HouseholdSerializer
+    permission_classes = [IsAuthenticated, IsHouseholdMember]
+    queryset = Household.objects.all()
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Retrieve a household",
+        responses={200: HouseholdSerializer, 403: "Not a member", 404: "Household not found"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Update a household (owners only)",
+        request_body=HouseholdSerializer,
+        responses={200: HouseholdSerializer, 400: "Invalid input data", 403: "Not an owner"},
+    )
+    def put(self, request, *args, **kwargs):
+        return super().put(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Partially update a household (owners only)",
+        request_body=HouseholdSerializer,
+        responses={200: HouseholdSerializer, 400: "Invalid input data", 403: "Not an owner"},
+    )
+    def patch(self, request, *args, **kwargs):
+        return super().patch(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Delete a household (owners only)",
+        responses={204: "No content (successful deletion)", 403: "Not an owner"},
+    )
+    def delete(self, request, *args, **kwargs):
+        return super().delete(request, *args, **kwargs)
+
+
+class HouseholdMemberListCreateView(generics.ListCreateAPIView):
+    serializer_class = HouseholdMembershipSerializer
+    permission_classes = [IsAuthenticated, IsHouseholdMember]
+    pagination_class = None
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return HouseholdMembership.objects.none()
+        return HouseholdMembership.objects.filter(household_id=self.kwargs["pk"]).select_related("user")
+
+    def perform_create(self, serializer):
+        if serializer.validated_data["user"].pk in self.household_roles:
+            raise ValidationError({"username": "This user is already a member."})
+        serializer.save(household_id=self.kwargs["pk"])
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="List household members",
+        responses={200: HouseholdMembershipSerializer(many=True), 403: "Not a member"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Add a member by username (owners only)",
+        request_body=HouseholdMembershipSerializer,
+        responses={201: HouseholdMembershipSerializer, 400: "Invalid input data", 403: "Not an owner"},
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class HouseholdMemberDestroyView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Remove a member (owners), or leave the household (any member)",
+        responses={
+            204: "No content (successful removal)",
+            400: "Last owner of a household with other members",
+            403: "Not allowed",
+            404: "Member not found",
+        },
+    )
+    @transaction.atomic
+    def delete(self, request, pk, user_id):
+        # Any member may leave; only owners may remove someone else.
+        if user_id != request.user.pk and not IsHouseholdMember().has_permission(request, self):
+            self.permission_denied(request)
+        # Locking every membership of the household keeps two owners from leaving at once.
+        memberships = {
+            membership.user_id: membership
+            for membership in HouseholdMembership.objects.select_for_update().filter(household_id=pk)
+        }
+        membership = memberships.pop(user_id, None)
+        if membership is None:
+            raise Http404
+        owners = [other for other in memberships.values() if other.role == HouseholdMembership.OWNER]
+        if membership.role == HouseholdMembership.OWNER and memberships and not owners:
+            raise ValidationError("The last owner cannot leave while the household has other members.")
+        membership.delete()
+        return Response(status=204)
+
+
+class HouseholdSummaryView(APIView):
+    permission_classes = [IsAuthenticated, IsHouseholdMember]
+
+    @swagger_auto_schema(
+        tags=["Households"],
+        operation_description="Get combined expense totals and balances of all household members",
+        manual_parameters=[
+            openapi.Parameter(
+                "period",
+                openapi.IN_QUERY,
+                description="Time period for summary (month/quarter/year)",
+                type=openapi.TYPE_STRING,
+                enum=["month", "quarter", "year"],
+                default="month",
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="Household summary in the household currency",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "household": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "currency": openapi.Schema(type=openapi.TYPE_STRING),
+                        "total": openapi.Schema(type=openapi.TYPE_NUMBER, description="Combined expenses"),
+                        "balance": openapi.Schema(type=openapi.TYPE_NUMBER, description="Combined balance"),
+                        "by_category": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "category__name": openapi.Schema(type=openapi.TYPE_STRING),
+                                    "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                },
+                            ),
+                        ),
+                        "members": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "user_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    "username": openapi.Schema(type=openapi.TYPE_STRING),
+                                    "total": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "balance": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                },
+                            ),
+                        ),
+                        "period": openapi.Schema(type=openapi.TYPE_STRING),
+                        "period_start": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                    },
+                ),
+            ),
+            403: "Not a member",
+        },
+    )
+    def get(self, request, pk):
+        household = get_object_or_404(Household, pk=pk)
+        time_period = request.query_params.get("period", "month")
+        try:
+            summary = household_summary(household, list(self.household_roles), time_period, datetime.now())
+        except currency.CurrencyError as exc:
+            raise ValidationError({"currency": str(exc)})
+        return Response(summary)
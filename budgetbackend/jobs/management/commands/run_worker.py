@@ -0,0 +1,86 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+
+def work(tasks, poll_interval, stop, drain=False):
+    """Claim and run jobs until ``stop`` is set (or, with ``drain``, until the queue is empty)."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    last_recovery = 0
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            if time.monotonic() - last_recovery > settings.JOB_LOCK_TIMEOUT / 2:
+                queue.requeue_stale()
+                last_recovery = time.monotonic()
+            job = queue.claim(worker_id, tasks)
+        except DatabaseError:
+            logger.exception("Worker %s could not claim a job", worker_id)
+            stop.wait(poll_interval)
+            continue
+
+        if job is not None:
+            queue.run(job)
+        elif drain:
+            break
+        else:
+            stop.wait(poll_interval)
+    connections.close_all()
+
+
+def _child(tasks, poll_interval, stop, drain):
+    # The parent handles SIGINT/SIGTERM and tells children to stop after their current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(tasks, poll_interval, stop, drain)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Number of worker processes")
+        parser.add_argument("--task", action="append", dest="tasks", help="Only run these tasks")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when idle")
+        parser.add_argument("--drain", action="store_true", help="Exit once no runnable jobs are left")
+
+    def handle(self, *args, **options):
+        tasks = options["tasks"]
+        unknown = set(tasks or ()) - set(queue.registry)
+        if unknown:
+            self.stderr.write(self.style.WARNING(f"Unknown tasks: {', '.join(sorted(unknown))}"))
+
+        # Workers are forked so they inherit the configured Django setup.
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        if options["processes"] <= 1:
+            work(tasks, options["poll_interval"], stop, options["drain"])
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        processes = [
+            context.Process(
+                target=_child, args=(tasks, options["poll_interval"], stop, options["drain"]), daemon=True
+            )
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} workers for {', '.join(tasks or queue.registry)}")
+        for process in processes:
+            process.join()
@@ -0,0 +1,150 @@
+"""Database-backed job queue.
+
+Tasks are plain functions registered with :func:`task` in an app's ``tasks.py`` and
+called as ``func(job, **job.payload)``. Workers claim queued jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` so any number of worker processes, on any number
+of hosts, can share the table without an external broker.
+"""
+
+import logging
+import random
+import zlib
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from budgetbackend import sharding
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = 20
+
+
+Task = namedtuple("Task", ["name", "func", "concurrency", "max_attempts"])
+
+registry = {}
+
+
+def task(name, concurrency=None, max_attempts=3):
+    """Register ``func`` as a task.
+
+    ``concurrency`` caps how many jobs of this task may run at once across all workers.
+    """
+
+    def decorator(func):
+        registry[name] = Task(name, func, concurrency, max_attempts)
+        return func
+
+    return decorator
+
+
+def enqueue(name, user=None, payload=None, priority=0, run_after=None):
+    if name not in registry:
+        raise KeyError(f"Unknown task {name!r}")
+    return Job.objects.create(
+        task=name,
+        user=user,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=registry[name].max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff with up to 10% jitter so failed jobs do not retry in lockstep."""
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=delay * (1 + random.random() / 10))
+
+
+def _lock_task(name):
+    # Serialise concurrency checks for one task across workers until the transaction ends.
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [zlib.crc32(name.encode())])
+
+
+def claim(worker_id, tasks=None):
+    """Lock and return the next runnable job, or ``None`` when there is nothing to do."""
+    with transaction.atomic():
+        queued = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_after__lte=timezone.now(), task__in=tasks or list(registry)
+        )
+        for job in queued.order_by("-priority", "run_after")[:CLAIM_BATCH_SIZE]:
+            limit = registry[job.task].concurrency
+            if limit is not None:
+                _lock_task(job.task)
+                if Job.objects.filter(task=job.task, status=Job.RUNNING).count() >= limit:
+                    continue
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.locked_at = timezone.now()
+            job.save(update_fields=["status", "attempts", "locked_by", "locked_at", "updated_at"])
+            return job
+    return None
+
+
+def run(job):
+    try:
+        # Jobs started for a user work on that user's shard.
+        with sharding.for_user(job.user_id) if job.user_id else nullcontext():
+            result = registry[job.task].func(job, **job.payload)
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.task, job.attempts)
+        changes = {"error": f"{type(exc).__name__}: {exc}"}
+        if job.attempts >= job.max_attempts:
+            changes.update(status=Job.FAILED, finished_at=timezone.now())
+        else:
+            changes.update(status=Job.QUEUED, run_after=timezone.now() + retry_delay(job.attempts))
+    else:
+        changes = {
+            "status": Job.SUCCEEDED,
+            "result": result,
+            "progress": 100,
+            "error": "",
+            "finished_at": timezone.now(),
+        }
+    changes.update(locked_by="", locked_at=None, updated_at=timezone.now())
+    try:
+        # Only while this worker still holds the job: requeue_stale may have handed it back meanwhile.
+        finished = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+            **changes
+        )
+    except DatabaseError:
+        logger.exception("Could not record the outcome of job %s (%s)", job.pk, job.task)
+        return job
+    if finished:
+        for name, value in changes.items():
+            setattr(job, name, value)
+    else:
+        logger.warning("Job %s (%s) was taken from worker %s while it ran", job.pk, job.task, job.locked_by)
+    return job
+
+
+def requeue_stale():
+    """Return jobs whose worker died mid-run to the queue, or fail them when out of attempts."""
+    stale = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    )
+    requeued = 0
+    for job in stale:
+        changes = {
+            "status": Job.QUEUED if job.attempts < job.max_attempts else Job.FAILED,
+            "finished_at": None if job.attempts < job.max_attempts else timezone.now(),
+            "error": f"Worker {job.locked_by} stopped responding",
+            "locked_by": "",
+            "locked_at": None,
+            "updated_at": timezone.now(),
+        }
+        # Skipped when the worker finished or reported progress since the job was read.
+        requeued += Job.objects.filter(
+            pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by, locked_at=job.locked_at
+        ).update(**changes)
+    return requeued
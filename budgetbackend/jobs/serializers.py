@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "task",
+            "status",
+            "progress",
+            "progress_message",
+            "attempts",
+            "max_attempts",
+            "result",
+            "error",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        )
+        read_only_fields = fields
@@ -0,0 +1,42 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobListView(generics.ListAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Job.objects.none()
+        return Job.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(
+        tags=["Jobs"],
+        operation_description="List the current user's background jobs, newest first",
+        responses={200: JobSerializer(many=True), 401: "Unauthorized"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Job.objects.none()
+        return Job.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(
+        tags=["Jobs"],
+        operation_description="Get the status, progress and result of a background job",
+        responses={200: JobSerializer, 401: "Unauthorized", 404: "Job not found"},
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)